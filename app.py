@@ -1,5 +1,6 @@
+import os
 import streamlit as st
-from db_manager import DuckDBManager
+from db_manager import AsyncDuckDBManager, DuckDBManager, EventFilter
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -181,12 +182,23 @@ st.markdown('<h1 class="main-header">User Analytics Dashboard</h1>', unsafe_allo
 # Initialize DB
 @st.cache_resource
 def init_db():
-    db = DuckDBManager(":memory:")
-    db.create_tables()
-    db.load_csv_data("user_events.csv")
-    return db
+    # Reuses the database file across restarts while user_events.csv is unchanged;
+    # USER_EVENTS_DB=:memory: restores the old reload-on-start behaviour
+    return DuckDBManager.open_persistent(
+        os.environ.get("USER_EVENTS_DB", "user_events.duckdb"),
+        "user_events.csv",
+        read_only=os.environ.get("USER_EVENTS_DB_READ_ONLY") == "1",
+        full_fingerprint=True,  # the bundled CSV is small enough to hash whole
+        pool_size=int(os.environ.get("USER_EVENTS_DB_POOL", "4"))
+    )
+
+# Runs a view's independent panel queries concurrently on the manager's cursors
+@st.cache_resource
+def init_async_db():
+    return AsyncDuckDBManager(init_db())
 
 db = init_db()
+adb = init_async_db()
 
 # Sidebar
 st.sidebar.header("Analytics Options")
@@ -225,24 +237,40 @@ for view_name, view_value in views.items():
 if view is None:
     view = st.session_state.current_view
 
+# Sidebar filters - applied to every view and the quick stats
+st.sidebar.markdown("---")
+st.sidebar.markdown("### Filters")
+
+# Choices come from the unfiltered results, which stay cached
+date_bounds = db.get_date_range().iloc[0]
+first_day, last_day = pd.Timestamp(date_bounds['first_date']).date(), pd.Timestamp(date_bounds['last_date']).date()
+date_range = st.sidebar.date_input("Date range", value=(first_day, last_day),
+                                   min_value=first_day, max_value=last_day)
+# The picker returns a single date while the range is being selected
+start_date, end_date = date_range if len(date_range) == 2 else (first_day, last_day)
+categories = st.sidebar.multiselect("Categories", sorted(db.get_category_performance()['category']),
+                                    placeholder="All categories")
+user_type = st.sidebar.selectbox("User type", ["All users", "New", "Returning"])
+min_revenue = st.sidebar.number_input("Minimum session revenue ($)", min_value=0.0, value=0.0, step=10.0,
+                                      help="Revenue filters are answered from the raw events table")
+
+# Unset fields stay None so unfiltered renders share cached results
+filters = EventFilter(
+    start_date=start_date if start_date > first_day else None,
+    end_date=end_date if end_date < last_day else None,
+    categories=categories or None,
+    is_returning=None if user_type == "All users" else user_type == "Returning",
+    min_revenue=min_revenue or None
+)
+
 # Sidebar info - Simplified quick stats
 st.sidebar.markdown("---")
 st.sidebar.markdown("### Quick Stats")
 
-# Get stats safely
-@st.cache_data
+# Get stats safely (DuckDBManager caches results until the data changes)
 def get_sidebar_stats():
     try:
-        query = """
-        SELECT 
-            COUNT(*) as total_sessions,
-            COUNT(DISTINCT user_id) as unique_users,
-            SUM(CAST(converted AS INTEGER)) as total_conversions,
-            ROUND(AVG(CAST(converted AS FLOAT)) * 100, 2) as conversion_rate,
-            ROUND(SUM(revenue), 2) as total_revenue
-        FROM user_events
-        """
-        return db.execute_custom_query(query).iloc[0]
+        return db.get_dashboard_metrics(filters)['summary'].iloc[0]
     except Exception as e:
         return None
 
@@ -255,29 +283,16 @@ if sidebar_stats is not None:
 else:
     st.sidebar.info("Loading stats...")
 
-# Helper function to get summary stats
-@st.cache_data
-def get_summary_stats():
-    query = """
-    SELECT 
-        COUNT(*) as total_sessions,
-        COUNT(DISTINCT user_id) as unique_users,
-        SUM(CAST(converted AS INTEGER)) as total_conversions,
-        ROUND(AVG(CAST(converted AS FLOAT)) * 100, 2) as conversion_rate,
-        ROUND(SUM(revenue), 2) as total_revenue,
-        ROUND(AVG(revenue), 2) as avg_revenue_per_session,
-        ROUND(AVG(page_views), 2) as avg_page_views,
-        ROUND(AVG(time_on_page), 2) as avg_time_on_page
-    FROM user_events
-    """
-    return db.execute_custom_query(query).iloc[0]
-
 # Display analytics - Professional views with hover tooltips
 if view == "Executive Dashboard":
     st.header("Executive Dashboard")
     
+    # Trend charts cover the last 30 days; the window is applied in SQL
+    metrics, ts_df = adb.fetch(('get_dashboard_metrics', filters), ('get_timeseries_conversion', 'day', filters, 30))
+    stats = metrics['summary'].iloc[0]
+    cat_df = metrics['category']
+    
     # Critical Business KPIs with hover tooltips
-    stats = get_summary_stats()
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -308,7 +323,6 @@ if view == "Executive Dashboard":
     
     with col1:
         # Revenue by Category - Shows where money comes from
-        cat_df = db.get_category_performance()
         fig_revenue = px.bar(cat_df, x='category', y='total_revenue',
                            title="Revenue by Product Category",
                            color='total_revenue',
@@ -345,8 +359,6 @@ if view == "Executive Dashboard":
     
     # Revenue Trend Analysis
     st.subheader("Revenue Performance Trends")
-    ts_df = db.get_timeseries_conversion('day')
-    ts_df = ts_df.tail(30)  # Last 30 days
     
     fig_trends = make_subplots(specs=[[{"secondary_y": True}]])
     fig_trends.add_trace(
@@ -372,8 +384,9 @@ elif view == "Revenue Analytics":
     st.header("Revenue Analytics")
     
     # Revenue-focused KPIs
-    stats = get_summary_stats()
-    cat_df = db.get_category_performance()
+    metrics, ts_df = adb.fetch(('get_dashboard_metrics', filters), ('get_timeseries_conversion', 'day', filters, 30))
+    stats = metrics['summary'].iloc[0]
+    cat_df = metrics['category']
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -428,8 +441,6 @@ elif view == "Revenue Analytics":
     
     # Revenue Trends
     st.subheader("Revenue Performance Over Time")
-    ts_df = db.get_timeseries_conversion('day')
-    ts_df = ts_df.tail(30)
     
     fig_rev_trend = px.area(ts_df, x='period', y='total_revenue',
                            title="Daily Revenue Trend (Last 30 Days)",
@@ -443,9 +454,10 @@ elif view == "Conversion Optimization":
     st.header("Conversion Optimization")
     
     # Conversion-focused KPIs
-    stats = get_summary_stats()
-    user_df = db.get_user_type_breakdown()
-    funnel_df = db.get_conversion_funnel()
+    metrics, ts_df = adb.fetch(('get_dashboard_metrics', filters), ('get_timeseries_conversion', 'day', filters, 30))
+    stats = metrics['summary'].iloc[0]
+    user_df = metrics['user_type']
+    funnel_df = metrics['funnel']
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -501,8 +513,6 @@ elif view == "Conversion Optimization":
     
     # Conversion Trends
     st.subheader("Conversion Performance Trends")
-    ts_df = db.get_timeseries_conversion('day')
-    ts_df = ts_df.tail(30)
     
     fig_conv_trend = px.line(ts_df, x='period', y='conversion_rate',
                             title="Daily Conversion Rate Trend (Last 30 Days)",
@@ -517,9 +527,8 @@ elif view == "Performance Trends":
     st.header("Performance Trends")
     
     # Performance KPIs
-    stats = get_summary_stats()
-    ts_df = db.get_timeseries_conversion('day')
-    ts_df = ts_df.tail(30)
+    metrics, ts_df = adb.fetch(('get_dashboard_metrics', filters), ('get_timeseries_conversion', 'day', filters, 30))
+    stats = metrics['summary'].iloc[0]
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -1,23 +1,91 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime, timedelta
 import random
+import time
+import os
+import json
+import hashlib
+import math
+from concurrent.futures import ProcessPoolExecutor
 
 # Set random seed for reproducibility
 np.random.seed(42)
 random.seed(42)
 
-def generate_gtm_data(num_sessions=750):
+CATEGORIES = ['Electronics', 'Clothing', 'Home & Garden', 'Sports', 'Books']
+
+# Revenue multiplier per category (same order as CATEGORIES)
+CATEGORY_MULTIPLIERS = np.array([3.0, 1.0, 2.0, 1.5, 0.5])
+
+# Sessions are spread over the last DATE_RANGE_DAYS days (inclusive)
+DATE_RANGE_DAYS = 90
+
+# Skew profiles for the vectorized engine:
+#   user_zipf         Zipf exponent of sessions per user (None: uniform user_ids)
+#   category_weights  Share of sessions per category in CATEGORIES order (None: uniform)
+#   date_profile      'uniform', 'weekly' (weekend peaks), 'seasonal' (weekly plus a
+#                     ramp towards the end of the range) or 'bursty' (weekly plus a few
+#                     campaign days at several times the normal volume)
+SKEW_PROFILES = {
+    'uniform': {'user_zipf': None, 'category_weights': None, 'date_profile': 'uniform'},
+    'realistic': {'user_zipf': 0.8, 'category_weights': [0.35, 0.25, 0.2, 0.12, 0.08],
+                  'date_profile': 'weekly'},
+    'seasonal': {'user_zipf': 0.8, 'category_weights': [0.35, 0.25, 0.2, 0.12, 0.08],
+                 'date_profile': 'seasonal'},
+    'heavy': {'user_zipf': 1.2, 'category_weights': [0.6, 0.2, 0.1, 0.07, 0.03],
+              'date_profile': 'bursty'}
+}
+
+# Relative traffic Monday..Sunday for the non-uniform date profiles
+WEEKDAY_WEIGHTS = np.array([1.0, 0.95, 1.0, 1.05, 1.2, 1.5, 1.35])
+
+# Named benchmark dataset sizes (sessions)
+PRESETS = {
+    'XS': 750,
+    'S': 100_000,
+    'M': 1_000_000,
+    'L': 10_000_000,
+    'XL': 100_000_000
+}
+
+# Presets use a fixed date range and batch size so the same name always means the same bytes
+PRESET_END_DATE = datetime(2025, 10, 1)
+PRESET_BATCH_SIZE = 1_000_000
+PRESET_CACHE_DIR = os.environ.get('GTM_PRESET_CACHE', '.gtm_cache')
+
+
+def generate_gtm_data(num_sessions=750, engine='loop', seed=42, end_date=None, compact=False,
+                      skew=None):
     """
     Generate synthetic GTM event data for user sessions
     
     Parameters:
     num_sessions (int): Number of sessions to generate (default: 750)
+    engine (str): 'loop' for the row-by-row generator or 'vectorized' for
+        the NumPy column generator (default: 'loop')
+    seed (int): Seed for the vectorized engine (default: 42)
+    end_date (datetime): Last day of the date range for the vectorized
+        engine (default: now)
+    compact (bool): Return COMPACT_DTYPES columns (default: False)
+    skew (str or dict): Skew profile for the vectorized engine, see
+        SKEW_PROFILES (default: uniform)
     
     Returns:
     pd.DataFrame: Generated synthetic data
     """
     
+    if compact:
+        return compact_dtypes(generate_gtm_data(num_sessions, engine, seed, end_date, skew=skew))
+    if engine == 'vectorized':
+        return generate_gtm_data_vectorized(num_sessions, seed=seed, end_date=end_date, skew=skew)
+    if engine != 'loop':
+        raise ValueError(f"Unknown engine: {engine!r} (expected 'loop' or 'vectorized')")
+    if _resolve_skew(skew) != SKEW_PROFILES['uniform']:
+        raise ValueError("Skew profiles need engine='vectorized'")
+    
     # Configuration
     num_users = num_sessions // 3  # Average 3 sessions per user
     categories = ['Electronics', 'Clothing', 'Home & Garden', 'Sports', 'Books']
@@ -94,84 +162,1118 @@ def generate_gtm_data(num_sessions=750):
     return pd.DataFrame(data)
 
 
-def clean_and_validate_data(df):
+def _format_ids(prefix, numbers, width):
+    """
+    Format integers as zero-padded ids (e.g. 'user_00042') with Arrow kernels
+    
+    Parameters:
+    prefix (str): Id prefix such as 'user_'
+    numbers (np.ndarray): Integer ids
+    width (int): Minimum number of digits
+    
+    Returns:
+    np.ndarray: Formatted ids
+    """
+    
+    digits = pc.utf8_lpad(pc.cast(pa.array(numbers), pa.string()), width, '0')
+    return pc.binary_join_element_wise(prefix, digits, '').to_pandas()
+
+
+def _resolve_skew(skew):
+    """
+    Turn a profile name, a partial profile dict or None into a full profile
+    
+    Parameters:
+    skew (str, dict or None): Name in SKEW_PROFILES, or a dict overriding
+        keys of the uniform profile
+    
+    Returns:
+    dict: Profile with user_zipf, category_weights and date_profile
+    """
+    
+    if skew is None:
+        return dict(SKEW_PROFILES['uniform'])
+    if isinstance(skew, str):
+        if skew not in SKEW_PROFILES:
+            raise ValueError(f"Unknown skew profile: {skew!r} (expected one of {', '.join(SKEW_PROFILES)})")
+        return dict(SKEW_PROFILES[skew])
+    unknown = set(skew) - set(SKEW_PROFILES['uniform'])
+    if unknown:
+        raise ValueError(f"Unknown skew profile keys: {', '.join(sorted(unknown))}")
+    return dict(SKEW_PROFILES['uniform'], **skew)
+
+
+def _day_weights(date_profile, start_date):
+    """
+    Return the probability of each day offset 0..DATE_RANGE_DAYS under a date profile
+    
+    Burst days come from a fixed generator, so every block of a dataset
+    peaks on the same days.
+    """
+    
+    days = np.arange(DATE_RANGE_DAYS + 1)
+    if date_profile == 'uniform':
+        weights = np.ones(len(days))
+    elif date_profile in ('weekly', 'seasonal', 'bursty'):
+        weights = WEEKDAY_WEIGHTS[(start_date.weekday() + days) % 7]
+        if date_profile == 'seasonal':
+            weights = weights * (1 + 2.0 * (days / DATE_RANGE_DAYS) ** 2)
+        elif date_profile == 'bursty':
+            burst_days = np.random.default_rng(7).choice(len(days), size=5, replace=False)
+            weights = weights.copy()
+            weights[burst_days] *= 6
+    else:
+        raise ValueError(f"Unknown date profile: {date_profile!r}")
+    return weights / weights.sum()
+
+
+def _zipf_users(rng, size, num_users, exponent):
+    """
+    Draw user numbers 1..num_users with P(k) roughly proportional to k ** -exponent
+    
+    Uses the inverse CDF of a continuous power law on [1, num_users + 1)
+    and floors it, which needs O(1) memory however many users there are.
+    Ranks are then scattered over the id space by a fixed multiplicative
+    bijection, so whales are not concentrated in the low user numbers
+    that decide is_returning (the returning share stays that of the
+    uniform profile); the mapping is the same in every batch.
+    """
+    
+    u = rng.random(size)
+    upper = num_users + 1.0
+    if exponent == 1:
+        x = upper ** u
+    else:
+        x = (1 + u * (upper ** (1 - exponent) - 1)) ** (1 / (1 - exponent))
+    rank = np.minimum(x.astype(np.int64), num_users)
+    
+    # Knuth's multiplicative constant, stepped until coprime so the map is a permutation
+    multiplier = 2654435761 % num_users or 1
+    while math.gcd(multiplier, num_users) != 1:
+        multiplier += 1
+    return (rank - 1) * multiplier % num_users + 1
+
+
+def _generate_columns(rng, num_sessions, num_users, start_date, session_offset=0, skew=None):
+    """
+    Draw every column of a session frame as a whole array
+    
+    Mirrors the per-row logic of the loop engine, one NumPy call per column.
+    With the uniform profile the draws are those of the loop engine; other
+    profiles replace the user, category and date draws.
+    
+    Parameters:
+    rng (np.random.Generator): Random generator to draw from
+    num_sessions (int): Number of rows to draw
+    num_users (int): Size of the user_id space
+    start_date (datetime): First day of the session date range
+    session_offset (int): Number of sessions preceding this block, so that
+        session_ids continue from session_offset + 1
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    pd.DataFrame: Generated synthetic data
+    """
+    
+    n = num_sessions
+    skew = _resolve_skew(skew)
+    
+    # User ids (some users have multiple sessions, whales many under a Zipf profile)
+    if skew['user_zipf']:
+        user_num = _zipf_users(rng, n, num_users, skew['user_zipf'])
+    else:
+        user_num = rng.integers(1, num_users + 1, size=n)
+    
+    # Session ids are sequential across blocks
+    session_num = np.arange(session_offset + 1, session_offset + n + 1)
+    
+    # Page views, time on page and events use the same distributions as the loop
+    page_views = np.minimum(rng.gamma(2, 2, size=n).astype(np.int64) + 1, 20)
+    time_on_page = np.minimum(rng.exponential(180, size=n).astype(np.int64) + 30, 1800)
+    events_triggered = rng.poisson(page_views * 1.5).astype(np.int64)
+    
+    if skew['category_weights']:
+        weights = np.asarray(skew['category_weights'], dtype=float)
+        category_idx = rng.choice(len(CATEGORIES), size=n, p=weights / weights.sum())
+    else:
+        category_idx = rng.integers(0, len(CATEGORIES), size=n)
+    
+    # Low user numbers are always returning, the rest return 30% of the time
+    is_returning = np.where(
+        user_num < num_users * 0.4, 1, (rng.random(n) < 0.3).astype(np.int64)
+    )
+    
+    # Conversion probability (higher for returning users and more page views)
+    conv_prob = np.minimum(0.05 + 0.1 * is_returning + page_views * 0.01, 0.5)
+    converted = (rng.random(n) < conv_prob).astype(np.int64)
+    
+    # Revenue (only if converted), scaled by category
+    base_revenue = rng.gamma(2, 30, size=n)
+    revenue = np.where(
+        converted == 1, np.round(base_revenue * CATEGORY_MULTIPLIERS[category_idx], 2), 0.0
+    )
+    
+    # Only DATE_RANGE_DAYS + 1 distinct dates exist, so format them once and index
+    if skew['date_profile'] != 'uniform':
+        day_offsets = rng.choice(DATE_RANGE_DAYS + 1, size=n, p=_day_weights(skew['date_profile'], start_date))
+    else:
+        day_offsets = rng.integers(0, DATE_RANGE_DAYS + 1, size=n)
+    date_strings = np.array([
+        (start_date + timedelta(days=d)).strftime('%Y-%m-%d')
+        for d in range(DATE_RANGE_DAYS + 1)
+    ], dtype=object)
+    
+    return pd.DataFrame({
+        'user_id': _format_ids('user_', user_num, 5),
+        'session_id': _format_ids('session_', session_num, 6),
+        'page_views': page_views,
+        'time_on_page': time_on_page,
+        'events_triggered': events_triggered,
+        'category': np.array(CATEGORIES, dtype=object)[category_idx],
+        'is_returning': is_returning,
+        'converted': converted,
+        'revenue': revenue,
+        'session_date': date_strings[day_offsets]
+    })
+
+
+def generate_gtm_data_vectorized(num_sessions=750, seed=42, end_date=None, skew=None):
+    """
+    Generate synthetic GTM event data with whole-column NumPy draws
+    
+    Produces the same schema and distributions as the loop engine, but
+    from an independent np.random.Generator, so output depends only on
+    seed, num_sessions and end_date.
+    
+    Parameters:
+    num_sessions (int): Number of sessions to generate (default: 750)
+    seed (int): Random seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    pd.DataFrame: Generated synthetic data
+    """
+    
+    rng = np.random.default_rng(seed)
+    num_users = max(num_sessions // 3, 1)  # Average 3 sessions per user
+    
+    return _generate_columns(rng, num_sessions, num_users, _date_range_start(end_date), skew=skew)
+
+
+# Compact column types: integer-encoded ids, small counters, bool flags, date32 dates
+COMPACT_DTYPES = {
+    'user_id': 'int32',
+    'session_id': 'int64',
+    'page_views': 'int16',
+    'time_on_page': 'int32',
+    'events_triggered': 'int16',
+    'category': pd.CategoricalDtype(CATEGORIES),
+    'is_returning': 'bool',
+    'converted': 'bool',
+    'revenue': 'float32',
+    'session_date': pd.ArrowDtype(pa.date32())
+}
+
+
+def compact_dtypes(df):
+    """
+    Convert a session frame to compact column types
+    
+    'user_00042' / 'session_000042' become their integer numbers, category
+    becomes a categorical, counters shrink to int16/int32, flags to bool,
+    session_date to an Arrow date32 and revenue to float32. Uses roughly a
+    tenth of the memory of the string/int64 layout.
+    
+    Parameters:
+    df (pd.DataFrame): Sessions in the generate_gtm_data schema
+    
+    Returns:
+    pd.DataFrame: The same rows with COMPACT_DTYPES
+    """
+    
+    id_prefixes = {'user_id': 'user_', 'session_id': 'session_'}
+    
+    compact = {}
+    for column, dtype in COMPACT_DTYPES.items():
+        values = df[column]
+        if column in id_prefixes:
+            strings = pa.array(values, type=pa.string(), from_pandas=True)
+            digits = pc.utf8_slice_codeunits(strings, len(id_prefixes[column]))
+            compact[column] = pc.cast(digits, pa.int64()).to_numpy().astype(dtype)
+        elif column == 'session_date':
+            dates = pc.strptime(pa.array(values, type=pa.string(), from_pandas=True), '%Y-%m-%d', 's')
+            compact[column] = pd.Series(pd.arrays.ArrowExtensionArray(pc.cast(dates, pa.date32())),
+                                        index=df.index)
+        else:
+            compact[column] = values.astype(dtype)
+    
+    return pd.DataFrame(compact, index=df.index)
+
+
+def report_memory_savings(sizes=(1_000_000, 10_000_000)):
+    """
+    Print memory_usage(deep=True) of the default and compact layouts
+    
+    Parameters:
+    sizes (iterable): Session counts to measure
+    
+    Returns:
+    pd.DataFrame: One row per size with both footprints in MB and the ratio
+    """
+    
+    results = []
+    for num_sessions in sizes:
+        df = generate_gtm_data_vectorized(num_sessions)
+        default_mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+        compact_mb = compact_dtypes(df).memory_usage(deep=True).sum() / 1024 ** 2
+        del df
+        results.append({'rows': num_sessions, 'default_mb': round(default_mb, 1),
+                        'compact_mb': round(compact_mb, 1), 'ratio': round(default_mb / compact_mb, 1)})
+        print(f"  - {num_sessions:>12,} rows: {default_mb:10,.1f} MB -> {compact_mb:8,.1f} MB "
+              f"({default_mb / compact_mb:.1f}x smaller)")
+    
+    return pd.DataFrame(results)
+
+
+def _date_range_start(end_date=None):
+    """Return the first day of the session date range ending at end_date (default: now)."""
+    return (end_date or datetime.now()) - timedelta(days=DATE_RANGE_DAYS)
+
+
+def _shard_plan(num_sessions, shard_size):
+    """Return (block_index, session_offset, num_sessions) for every shard."""
+    return [
+        (block_index, offset, min(shard_size, num_sessions - offset))
+        for block_index, offset in enumerate(range(0, num_sessions, shard_size))
+    ]
+
+
+def _generate_block(seed, block_index, session_offset, num_sessions, num_users, start_date,
+                    skew=None):
+    """
+    Generate one fixed-size block of sessions from its own child seed
+    
+    The child seed depends only on (seed, block_index), so a block is the
+    same no matter when or where it is generated.
+    
+    Parameters:
+    seed (int): Master seed
+    block_index (int): Position of the block in the dataset
+    session_offset (int): Number of sessions in all preceding blocks
+    num_sessions (int): Rows in this block
+    num_users (int): Size of the user_id space of the whole dataset
+    start_date (datetime): First day of the session date range
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    pd.DataFrame: Generated synthetic data
+    """
+    
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index,)))
+    return _generate_columns(rng, num_sessions, num_users, start_date, session_offset, skew)
+
+
+def iter_gtm_batches(num_sessions, batch_size=1_000_000, seed=42, end_date=None, compact=False,
+                     skew=None, session_offset=0):
+    """
+    Yield synthetic GTM event data as fixed-size DataFrame batches
+    
+    Only one batch is held in memory at a time. Every batch but the last
+    has exactly batch_size rows, session_ids run sequentially across
+    batches and user_ids are drawn from the space of the whole dataset.
+    
+    Parameters:
+    num_sessions (int): Total number of sessions to generate
+    batch_size (int): Rows per batch (default: 1,000,000)
+    seed (int): Master seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    compact (bool): Yield COMPACT_DTYPES columns (default: False)
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    session_offset (int): Sessions numbered before this run, so session_ids
+        start at session_offset + 1 (default: 0)
+    
+    Yields:
+    pd.DataFrame: One batch of generated synthetic data
+    """
+    
+    num_users = max(num_sessions // 3, 1)  # Average 3 sessions per user
+    start_date = _date_range_start(end_date)
+    
+    for block_index, offset, n in _shard_plan(num_sessions, batch_size):
+        batch = _generate_block(seed, block_index, session_offset + offset, n, num_users,
+                                start_date, skew)
+        yield compact_dtypes(batch) if compact else batch
+
+
+def write_batches(output_file, batches, file_format=None):
+    """
+    Write an iterable of DataFrame batches to one Parquet or CSV file
+    
+    Parquet output gets one row group per batch, CSV output is appended
+    batch by batch, so only one batch is held in memory at a time.
+    
+    Parameters:
+    output_file (str): Destination file
+    batches (iterable): DataFrames with identical columns
+    file_format (str): 'parquet' or 'csv' (default: from the file extension)
+    
+    Returns:
+    int: Rows written
+    """
+    
+    import pyarrow.parquet as pq
+    
+    file_format = file_format or ('parquet' if str(output_file).endswith('.parquet') else 'csv')
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"Unknown file format: {file_format!r} (expected 'parquet' or 'csv')")
+    
+    rows = 0
+    writer = None
+    try:
+        for batch_index, batch in enumerate(batches):
+            if file_format == 'parquet':
+                table = pa.Table.from_pandas(batch, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema)
+                writer.write_table(table.cast(writer.schema), row_group_size=max(len(batch), 1))
+            else:
+                batch.to_csv(output_file, mode='w' if batch_index == 0 else 'a',
+                             header=batch_index == 0, index=False)
+            
+            rows += len(batch)
+            print(f"  - Batch {batch_index + 1}: {rows:,} rows written")
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    return rows
+
+
+def write_gtm_stream(output_file, num_sessions, batch_size=1_000_000, file_format=None,
+                     seed=42, end_date=None, compact=False, skew=None):
+    """
+    Generate, validate and write sessions batch by batch
+    
+    Peak memory is bounded by batch_size rather than num_sessions.
+    
+    Parameters:
+    output_file (str): Destination file
+    num_sessions (int): Total number of sessions to generate
+    batch_size (int): Rows per batch / row group (default: 1,000,000)
+    file_format (str): 'parquet' or 'csv' (default: from the file extension)
+    seed (int): Master seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    compact (bool): Write COMPACT_DTYPES columns (integer ids, dictionary
+        category, date32 dates) (default: False)
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    dict: Rows written, conversions and revenue totals
+    """
+    
+    totals = {'rows': 0, 'conversions': 0, 'revenue': 0.0}
+    
+    def validated_batches():
+        for batch in iter_gtm_batches(num_sessions, batch_size, seed, end_date, compact, skew):
+            batch = clean_and_validate_data(batch, verbose=False)
+            totals['conversions'] += int(batch['converted'].sum())
+            totals['revenue'] += float(batch['revenue'].sum())
+            yield batch
+    
+    totals['rows'] = write_batches(output_file, validated_batches(), file_format)
+    return totals
+
+
+def _write_shard(task):
+    """
+    Generate one shard and write it to its own file (process pool worker)
+    
+    Parameters:
+    task (tuple): (path, file_format, seed, block_index, session_offset,
+        num_sessions, num_users, start_date, skew)
+    
+    Returns:
+    tuple: (path, rows written)
+    """
+    
+    path, file_format, seed, block_index, offset, n, num_users, start_date, skew = task
+    df = clean_and_validate_data(
+        _generate_block(seed, block_index, offset, n, num_users, start_date, skew), verbose=False
+    )
+    if file_format == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path, len(df)
+
+
+def generate_gtm_data_parallel(num_sessions, shard_size=1_000_000, workers=None, seed=42,
+                               end_date=None, skew=None):
+    """
+    Generate synthetic GTM event data in shards across a process pool
+    
+    Shard i is drawn from child seed (seed, i), covers session_ids
+    [i * shard_size + 1, (i + 1) * shard_size] and draws user_ids from the
+    space of the whole dataset. The output depends on shard_size but not
+    on workers, and equals concatenating iter_gtm_batches(num_sessions,
+    shard_size, seed).
+    
+    Parameters:
+    num_sessions (int): Total number of sessions to generate
+    shard_size (int): Rows per shard (default: 1,000,000)
+    workers (int): Worker processes (default: os.cpu_count())
+    seed (int): Master seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    pd.DataFrame: Generated synthetic data
+    """
+    
+    num_users = max(num_sessions // 3, 1)  # Average 3 sessions per user
+    start_date = _date_range_start(end_date)
+    plan = _shard_plan(num_sessions, shard_size)
+    
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        shards = list(pool.map(
+            _generate_block,
+            *zip(*[(seed, i, offset, n, num_users, start_date, skew) for i, offset, n in plan])
+        ))
+    
+    if not shards:
+        return _generate_block(seed, 0, 0, 0, num_users, start_date, skew)
+    return pd.concat(shards, ignore_index=True)
+
+
+def write_gtm_shards(output_dir, num_sessions, shard_size=1_000_000, workers=None, seed=42,
+                     end_date=None, file_format='parquet', skew=None):
+    """
+    Generate, validate and write one file per shard across a process pool
+    
+    Each worker writes its own part-NNNNN file, so nothing larger than a
+    shard passes between processes. Files are identical for any number of
+    workers.
+    
+    Parameters:
+    output_dir (str): Directory for the part files (created if missing)
+    num_sessions (int): Total number of sessions to generate
+    shard_size (int): Rows per shard / file (default: 1,000,000)
+    workers (int): Worker processes (default: os.cpu_count())
+    seed (int): Master seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    file_format (str): 'parquet' or 'csv' (default: 'parquet')
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    list: (path, rows) for every shard, in session_id order
+    """
+    
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"Unknown file format: {file_format!r} (expected 'parquet' or 'csv')")
+    
+    os.makedirs(output_dir, exist_ok=True)
+    num_users = max(num_sessions // 3, 1)  # Average 3 sessions per user
+    start_date = _date_range_start(end_date)
+    tasks = [
+        (os.path.join(output_dir, f"part-{i:05d}.{file_format}"), file_format,
+         seed, i, offset, n, num_users, start_date, skew)
+        for i, offset, n in _shard_plan(num_sessions, shard_size)
+    ]
+    
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(_write_shard, tasks))
+
+
+def iter_arrow_batches(num_sessions, batch_size=1_000_000, seed=42, end_date=None, skew=None):
+    """
+    Stream validated sessions as an Arrow RecordBatchReader
+    
+    Parameters:
+    num_sessions (int): Total number of sessions to generate
+    batch_size (int): Rows per batch (default: 1,000,000)
+    seed (int): Master seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    pa.RecordBatchReader: Reader over the generated batches
+    """
+    
+    tables = (
+        pa.Table.from_pandas(clean_and_validate_data(batch, verbose=False), preserve_index=False)
+        for batch in iter_gtm_batches(num_sessions, batch_size, seed, end_date, skew=skew)
+    )
+    first = next(tables, None)
+    if first is None:
+        first = pa.Table.from_pandas(_generate_block(seed, 0, 0, 0, 1, _date_range_start(end_date)),
+                                     preserve_index=False)
+    schema = first.schema
+    
+    def batches():
+        yield from first.to_batches()
+        for table in tables:
+            yield from table.cast(schema).to_batches()
+    
+    return pa.RecordBatchReader.from_batches(schema, batches())
+
+
+def generate_into_duckdb(db, num_sessions, batch_size=1_000_000, seed=42, end_date=None,
+                         skew=None):
+    """
+    Generate sessions straight into a DuckDBManager's user_events table
+    
+    Batches are streamed to DuckDB as Arrow record batches in a single
+    INSERT, skipping the CSV write and the read_csv_auto parse of the
+    file-based pipeline while keeping memory bounded by batch_size.
+    
+    Parameters:
+    db (DuckDBManager): Manager whose user_events table receives the rows
+    num_sessions (int): Total number of sessions to generate
+    batch_size (int): Rows per batch (default: 1,000,000)
+    seed (int): Master seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    skew (str or dict): Skew profile, see SKEW_PROFILES (default: uniform)
+    
+    Returns:
+    int: Rows inserted
+    """
+    
+    start = time.perf_counter()
+    rows = db.insert_dataframe(iter_arrow_batches(num_sessions, batch_size, seed, end_date, skew))
+    elapsed = time.perf_counter() - start
+    print(f"✓ Generated {rows:,} rows into DuckDB in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed > 0 else 0:,.0f} rows/sec)")
+    return rows
+
+
+def _file_sha256(path, chunk_size=8 * 1024 * 1024):
+    """Return the hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_preset(name, cache_dir=None, seed=42, file_format='parquet', verify=False, force=False,
+               skew='uniform'):
+    """
+    Return the path of a named benchmark dataset, generating it on first use
+    
+    Datasets live in cache_dir next to a JSON manifest recording preset,
+    row count, seed, date range, checksum and generation time. A later
+    request with the same parameters reuses the file as long as it exists
+    with the recorded size; verify=True also re-checks the SHA-256.
+    
+    Parameters:
+    name (str): Preset name, one of PRESETS (case-insensitive)
+    cache_dir (str): Cache directory (default: $GTM_PRESET_CACHE or '.gtm_cache')
+    seed (int): Master seed (default: 42)
+    file_format (str): 'parquet' or 'csv' (default: 'parquet')
+    verify (bool): Recompute the checksum of a cached file (default: False)
+    force (bool): Regenerate even if a valid cached file exists (default: False)
+    skew (str): Skew profile name, see SKEW_PROFILES (default: 'uniform')
+    
+    Returns:
+    str: Path of the dataset file
+    """
+    
+    name = name.upper()
+    if name not in PRESETS:
+        raise ValueError(f"Unknown preset: {name!r} (expected one of {', '.join(PRESETS)})")
+    
+    cache_dir = cache_dir or PRESET_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    _resolve_skew(skew)
+    suffix = '' if skew == 'uniform' else f"_{skew}"
+    path = os.path.join(cache_dir, f"gtm_{name.lower()}_seed{seed}{suffix}.{file_format}")
+    manifest_path = path + '.manifest.json'
+    expected = {
+        'preset': name,
+        'num_sessions': PRESETS[name],
+        'seed': seed,
+        'end_date': PRESET_END_DATE.strftime('%Y-%m-%d'),
+        'batch_size': PRESET_BATCH_SIZE,
+        'file_format': file_format,
+        'skew': skew
+    }
+    
+    if not force and os.path.exists(manifest_path) and os.path.exists(path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        cached = (all(manifest.get(key) == value for key, value in expected.items())
+                  and os.path.getsize(path) == manifest.get('bytes'))
+        if cached and verify:
+            cached = _file_sha256(path) == manifest.get('sha256')
+        if cached:
+            print(f"✓ Reusing preset {name}: {manifest['rows']:,} rows at {path}")
+            return path
+    
+    print(f"Generating preset {name} ({PRESETS[name]:,} sessions) into {path}...")
+    temp_path = path + '.tmp'
+    start = time.perf_counter()
+    totals = write_gtm_stream(temp_path, PRESETS[name], batch_size=PRESET_BATCH_SIZE,
+                              file_format=file_format, seed=seed, end_date=PRESET_END_DATE,
+                              skew=skew)
+    elapsed = time.perf_counter() - start
+    os.replace(temp_path, path)
+    
+    manifest = dict(
+        expected,
+        rows=totals['rows'],
+        bytes=os.path.getsize(path),
+        sha256=_file_sha256(path),
+        generated_at=datetime.now().isoformat(timespec='seconds'),
+        generation_seconds=round(elapsed, 2)
+    )
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    print(f"✓ Preset {name} ready: {manifest['rows']:,} rows in {elapsed:.1f}s")
+    return path
+
+
+def resolve_dataset(name_or_path, **preset_options):
+    """
+    Resolve a benchmark dataset reference to a file path
+    
+    Parameters:
+    name_or_path (str): Preset name (e.g. 'M') or a path to an existing file
+    preset_options: Passed to get_preset for preset names
+    
+    Returns:
+    str: Path of the dataset file
+    """
+    
+    if str(name_or_path).upper() in PRESETS:
+        return get_preset(name_or_path, **preset_options)
+    if not os.path.exists(name_or_path):
+        raise FileNotFoundError(f"No preset or file named {name_or_path!r}")
+    return name_or_path
+
+
+def load_preset(db, name, **preset_options):
+    """
+    Load a preset (or dataset path) into a DuckDBManager's user_events table
+    
+    Parquet files are streamed into DuckDB as Arrow batches; CSV files go
+    through load_csv_data.
+    
+    Parameters:
+    db (DuckDBManager): Manager whose user_events table receives the rows
+    name (str): Preset name or dataset path
+    preset_options: Passed to get_preset
+    
+    Returns:
+    int: Rows inserted
+    """
+    
+    import pyarrow.parquet as pq
+    
+    path = resolve_dataset(name, **preset_options)
+    if not path.endswith('.parquet'):
+        before = db.conn.execute("SELECT COUNT(*) FROM user_events").fetchone()[0]
+        db.load_csv_data(path)
+        return db.conn.execute("SELECT COUNT(*) FROM user_events").fetchone()[0] - before
+    
+    parquet = pq.ParquetFile(path)
+    return db.insert_dataframe(pa.RecordBatchReader.from_batches(parquet.schema_arrow,
+                                                                 parquet.iter_batches()))
+
+
+def benchmark_generators(sizes=(750, 10_000, 100_000, 1_000_000), loop_max_rows=100_000):
+    """
+    Compare rows/sec of the loop and vectorized engines
+    
+    Parameters:
+    sizes (iterable): Session counts or preset names to generate
+    loop_max_rows (int): Skip the loop engine above this size, since it
+        runs at a few tens of thousands of rows/sec
+    
+    Returns:
+    pd.DataFrame: One row per (engine, rows) with seconds and rows/sec
+    """
+    
+    results = []
+    for num_sessions in sizes:
+        num_sessions = PRESETS.get(str(num_sessions).upper()) or int(num_sessions)
+        for engine in ('loop', 'vectorized'):
+            if engine == 'loop' and num_sessions > loop_max_rows:
+                continue
+            start = time.perf_counter()
+            generate_gtm_data(num_sessions=num_sessions, engine=engine)
+            elapsed = time.perf_counter() - start
+            results.append({
+                'engine': engine,
+                'rows': num_sessions,
+                'seconds': round(elapsed, 3),
+                'rows_per_sec': round(num_sessions / elapsed) if elapsed > 0 else float('inf')
+            })
+            print(f"  - {engine:>10}: {num_sessions:>12,} rows in {elapsed:8.3f}s "
+                  f"({results[-1]['rows_per_sec']:,} rows/sec)")
+    
+    return pd.DataFrame(results)
+
+
+# Range rules applied by clean_and_validate_data: (rule name, column, comparison, bound)
+RANGE_RULES = [
+    ('page_views', 'page_views', np.greater, 0),        # Page views should be positive
+    ('time_on_page', 'time_on_page', np.greater, 0),    # Time on page should be positive
+    ('events_triggered', 'events_triggered', np.greater_equal, 0),  # Events should be non-negative
+    ('revenue', 'revenue', np.greater_equal, 0),        # Revenue should be non-negative
+]
+
+# Rejection reasons in the order they are checked; a row counts against the first it fails
+VALIDATION_RULES = ['non_numeric', 'null', 'duplicate_session_id'] + [rule for rule, _, _, _ in RANGE_RULES]
+
+BINARY_COLUMNS = ['is_returning', 'converted']
+
+# Columns that must parse as numbers; integer ones are restored to int64 once bad rows are gone
+INTEGER_COLUMNS = ['page_views', 'time_on_page', 'events_triggered']
+NUMERIC_COLUMNS = INTEGER_COLUMNS + ['revenue'] + BINARY_COLUMNS
+
+
+def clean_and_validate_data(df, verbose=True, return_report=False, keep_rejected=False,
+                            seen_session_ids=None):
     """
     Clean and validate the generated data
     
+    All rules are folded into one validity mask built from the column
+    arrays, and the frame is filtered once at the end (not at all when
+    every row is valid).
+    
     Parameters:
     df (pd.DataFrame): Input dataframe
+    verbose (bool): Print what was found and removed (default: True)
+    return_report (bool): Also return the rejection report (default: False)
+    keep_rejected (bool): Include the rejected rows, with a reject_reason
+        column, in the report (default: False)
+    seen_session_ids (SeenSessionIds): session_ids from earlier chunks of
+        the same dataset; duplicates are checked against and added to it
+        (default: duplicates within df only)
     
     Returns:
     pd.DataFrame: Cleaned dataframe
+    dict: Rejection report, only if return_report is True. Holds rows_in,
+        rows_out, rejected (rule -> rows rejected, in VALIDATION_RULES
+        order), null_columns (column -> null count) and rejected_rows
+        (DataFrame or None)
     """
     
-    print("Original data shape:", df.shape)
+    log = print if verbose else (lambda *args, **kwargs: None)
+    
+    log("Original data shape:", df.shape)
+    
+    num_rows = len(df)
+    invalid = np.zeros(num_rows, dtype=bool)
+    reasons = np.zeros(num_rows, dtype=np.int8) if keep_rejected else None
+    report = {'rows_in': num_rows, 'rows_out': num_rows, 'rejected': {},
+              'null_columns': {}, 'rejected_rows': None}
+    
+    def reject(rule, failed):
+        # Count rows against the first rule they fail only
+        new = failed & ~invalid
+        report['rejected'][rule] = int(new.sum())
+        if keep_rejected:
+            reasons[new] = VALIDATION_RULES.index(rule) + 1
+        invalid[new] = True
+    
+    # Text in a numeric column (e.g. a CSV chunk with page_views='abc') is
+    # coerced to NaN so the range rules can compare; the rows are rejected
+    # here and reported with their original values
+    original = df
+    non_numeric = np.zeros(num_rows, dtype=bool)
+    coerced = []
+    for column in NUMERIC_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            continue
+        numbers = pd.to_numeric(values, errors='coerce')
+        non_numeric |= (numbers.isna() & values.notna()).to_numpy()
+        if not coerced:
+            df = df.copy()
+        df[column] = numbers
+        coerced.append(column)
+    reject('non_numeric', non_numeric)
+    if report['rejected']['non_numeric']:
+        log(f"\n{report['rejected']['non_numeric']} rows with non-numeric values found. Removing...")
     
     # Check for nulls
-    null_counts = df.isnull().sum()
-    if null_counts.sum() > 0:
-        print("\nNull values found:")
-        print(null_counts[null_counts > 0])
-        df = df.dropna()
+    null_mask = np.zeros(num_rows, dtype=bool)
+    for column in original.columns:
+        column_nulls = original[column].isna().to_numpy()
+        null_count = int(column_nulls.sum())
+        if null_count:
+            report['null_columns'][column] = null_count
+            null_mask |= column_nulls
+    reject('null', null_mask)
+    if report['null_columns']:
+        log("\nNull values found:")
+        log(pd.Series(report['null_columns']))
     else:
-        print("\nNo null values found.")
+        log("\nNo null values found.")
     
-    # Check for duplicates (by session_id)
-    duplicates = df.duplicated(subset=['session_id']).sum()
-    if duplicates > 0:
-        print(f"\n{duplicates} duplicate session_ids found. Removing duplicates...")
-        df = df.drop_duplicates(subset=['session_id'], keep='first')
+    # Check for duplicates (by session_id), ignoring rows already dropped for nulls
+    if seen_session_ids is not None:
+        duplicates = seen_session_ids.add(df['session_id'], ~invalid)
+    else:
+        duplicates = df['session_id'].where(~invalid).duplicated().to_numpy()
+    reject('duplicate_session_id', duplicates)
+    if report['rejected']['duplicate_session_id']:
+        log(f"\n{report['rejected']['duplicate_session_id']} duplicate session_ids found. "
+            "Removing duplicates...")
     else:
-        print("\nNo duplicate session_ids found.")
+        log("\nNo duplicate session_ids found.")
     
     # Validate data ranges
-    print("\nValidating data ranges...")
-    
-    # Page views should be positive
-    invalid_pv = df[df['page_views'] <= 0].shape[0]
-    if invalid_pv > 0:
-        print(f"  - Removing {invalid_pv} rows with invalid page_views")
-        df = df[df['page_views'] > 0]
-    
-    # Time on page should be positive
-    invalid_time = df[df['time_on_page'] <= 0].shape[0]
-    if invalid_time > 0:
-        print(f"  - Removing {invalid_time} rows with invalid time_on_page")
-        df = df[df['time_on_page'] > 0]
-    
-    # Events should be non-negative
-    invalid_events = df[df['events_triggered'] < 0].shape[0]
-    if invalid_events > 0:
-        print(f"  - Removing {invalid_events} rows with invalid events_triggered")
-        df = df[df['events_triggered'] >= 0]
-    
-    # Revenue should be non-negative
-    invalid_revenue = df[df['revenue'] < 0].shape[0]
-    if invalid_revenue > 0:
-        print(f"  - Removing {invalid_revenue} rows with invalid revenue")
-        df = df[df['revenue'] >= 0]
+    log("\nValidating data ranges...")
+    for rule, column, compare, bound in RANGE_RULES:
+        reject(rule, ~compare(df[column].to_numpy(), bound))
+        if report['rejected'][rule]:
+            log(f"  - Removing {report['rejected'][rule]} rows with invalid {column}")
+    
+    if invalid.any():
+        if keep_rejected:
+            rejected = original[invalid].copy()
+            rejected['reject_reason'] = np.array(VALIDATION_RULES)[reasons[invalid] - 1]
+            report['rejected_rows'] = rejected
+        df = df[~invalid]
+    
+    for column in INTEGER_COLUMNS:
+        if column in coerced:
+            df[column] = df[column].astype(np.int64)
     
     # Binary columns should be 0 or 1
-    df['is_returning'] = df['is_returning'].astype(int).clip(0, 1)
-    df['converted'] = df['converted'].astype(int).clip(0, 1)
+    for column in BINARY_COLUMNS:
+        values = df[column].to_numpy()
+        if values.dtype.kind == 'b':
+            continue
+        if values.dtype.kind != 'i' or (len(values) and (values.min() < 0 or values.max() > 1)):
+            df[column] = np.clip(values.astype(int), 0, 1)
     
-    print("\nCleaned data shape:", df.shape)
+    report['rows_out'] = len(df)
+    log("\nCleaned data shape:", df.shape)
     
+    if return_report:
+        return df, report
     return df
 
 
-def main():
+class SeenSessionIds:
+    """
+    Compact set of session_ids for duplicate detection across chunks
+    
+    Ids in the generator's canonical 'session_NNNNNN' form are stored as
+    one bit per integer id (about 60 MB for 500M sessions). The bitset
+    grows with the largest id, so ids from BITSET_MAX_ID up go to a sorted
+    int64 array instead; any other id falls back to a Python set.
+    """
+    
+    PREFIX = 'session_'
+    # f"session_{n:06d}": exactly six digits, or more without a leading zero
+    CANONICAL_PATTERN = r'^session_(\d{6}|[1-9]\d{6,17})$'
+    # Bitset ids stay below this, capping the bitset at 128 MB
+    BITSET_MAX_ID = 1 << 30
+    
+    def __init__(self):
+        self._bits = np.zeros(0, dtype=np.uint8)
+        self._large = np.zeros(0, dtype=np.int64)
+        self._other = set()
+    
+    def __len__(self):
+        # Popcount via a byte histogram, without unpacking the bitset
+        bits_per_byte = np.array([bin(value).count('1') for value in range(256)])
+        return (int(np.bincount(self._bits, minlength=256) @ bits_per_byte)
+                + len(self._large) + len(self._other))
+    
+    def add(self, session_ids, mask=None):
+        """
+        Record session_ids and flag the ones already seen
+        
+        Parameters:
+        session_ids (pd.Series): Ids of one chunk
+        mask (np.ndarray): Rows to consider; others are ignored and never
+            flagged (default: all rows)
+        
+        Returns:
+        np.ndarray: True where the id was seen in an earlier chunk or
+            earlier in this chunk
+        """
+        
+        considered = np.ones(len(session_ids), dtype=bool) if mask is None else mask
+        duplicates = session_ids.where(considered).duplicated().to_numpy() & considered
+        
+        # Integer-encode ids that round-trip through the canonical format
+        values = pa.array(session_ids, type=pa.string(), from_pandas=True)
+        encodable = considered & pc.fill_null(
+            pc.match_substring_regex(values, self.CANONICAL_PATTERN), False
+        ).to_numpy(zero_copy_only=False)
+        digits = pc.utf8_slice_codeunits(values.filter(pa.array(encodable)), len(self.PREFIX))
+        ids = pc.cast(digits, pa.int64()).to_numpy()
+        
+        seen = np.zeros(len(ids), dtype=bool)
+        small = ids < self.BITSET_MAX_ID
+        if small.any():
+            small_ids = ids[small]
+            needed = int(small_ids.max()) // 8 + 1
+            if needed > len(self._bits):
+                size = min(max(needed, 2 * len(self._bits)), self.BITSET_MAX_ID // 8)
+                self._bits = np.concatenate([self._bits, np.zeros(size - len(self._bits), np.uint8)])
+            byte, bit = small_ids >> 3, (small_ids & 7).astype(np.uint8)
+            seen[small] = ((self._bits[byte] >> bit) & 1).astype(bool)
+            np.bitwise_or.at(self._bits, byte, np.left_shift(1, bit).astype(np.uint8))
+        if not small.all():
+            large_ids = ids[~small]
+            position = np.minimum(np.searchsorted(self._large, large_ids), max(len(self._large) - 1, 0))
+            seen[~small] = (self._large[position] == large_ids) if len(self._large) else False
+            self._large = np.union1d(self._large, large_ids)
+        duplicates[encodable] |= seen
+        
+        # Everything else goes through the fallback set
+        for position in np.flatnonzero(considered & ~encodable):
+            session_id = session_ids.iat[position]
+            if session_id in self._other:
+                duplicates[position] = True
+            self._other.add(session_id)
+        
+        return duplicates
+
+
+def validate_csv_chunked(input_path, output_path=None, chunksize=1_000_000, rejects_path=None):
+    """
+    Validate a CSV of any size chunk by chunk with bounded memory
+    
+    Range and binary rules run per chunk; duplicate session_ids are
+    detected across the whole file with a SeenSessionIds bitset.
+    
+    Parameters:
+    input_path (str): CSV file to validate
+    output_path (str): Write the valid rows here (default: don't write)
+    chunksize (int): Rows per chunk (default: 1,000,000)
+    rejects_path (str): Write rejected rows with their reject_reason here
+        (default: don't write)
+    
+    Returns:
+    dict: Rejection report with rows_in, rows_out, rejected and null_columns
+    """
+    
+    seen = SeenSessionIds()
+    totals = {'rows_in': 0, 'rows_out': 0, 'rejected': dict.fromkeys(VALIDATION_RULES, 0),
+              'null_columns': {}}
+    string_columns = {'user_id': str, 'session_id': str, 'category': str, 'session_date': str}
+    
+    start = time.perf_counter()
+    for chunk_index, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize,
+                                                    dtype=string_columns)):
+        cleaned, report = clean_and_validate_data(
+            chunk, verbose=False, return_report=True, keep_rejected=rejects_path is not None,
+            seen_session_ids=seen
+        )
+        
+        totals['rows_in'] += report['rows_in']
+        totals['rows_out'] += report['rows_out']
+        for rule, count in report['rejected'].items():
+            totals['rejected'][rule] += count
+        for column, count in report['null_columns'].items():
+            totals['null_columns'][column] = totals['null_columns'].get(column, 0) + count
+        
+        first = chunk_index == 0
+        if output_path:
+            cleaned.to_csv(output_path, mode='w' if first else 'a', header=first, index=False)
+        if rejects_path and (first or report['rejected_rows'] is not None):
+            rejected = report['rejected_rows']
+            if rejected is None:
+                rejected = chunk.iloc[:0].assign(reject_reason=pd.Series(dtype=str))
+            rejected.to_csv(rejects_path, mode='w' if first else 'a', header=first, index=False)
+        
+        print(f"  - Chunk {chunk_index + 1}: {totals['rows_in']:,} rows read, "
+              f"{totals['rows_in'] - totals['rows_out']:,} rejected")
+    
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Validated {totals['rows_in']:,} rows in {elapsed:.1f}s: "
+          f"{totals['rows_out']:,} valid, {totals['rows_in'] - totals['rows_out']:,} rejected")
+    for rule, count in totals['rejected'].items():
+        if count:
+            print(f"  - {rule}: {count:,}")
+    
+    return totals
+
+
+def main(num_sessions=750, engine='loop', output_file='gtm_event_data.csv',
+         stream=False, batch_size=1_000_000, workers=None, duckdb_path=None, compact=False,
+         skew=None):
     """
     Main function to generate, clean, and export GTM data
+    
+    Parameters:
+    num_sessions (int): Number of sessions to generate (default: 750)
+    engine (str): 'loop' or 'vectorized' (default: 'loop')
+    output_file (str): CSV or Parquet file to write (default: 'gtm_event_data.csv')
+    stream (bool): Generate and write in batches of batch_size rows with
+        bounded memory instead of building one DataFrame (default: False)
+    batch_size (int): Rows per batch in streaming mode (default: 1,000,000)
+    workers (int): In streaming mode, generate batches in this many
+        processes and write one part file each into a directory named
+        after output_file (default: single process)
+    duckdb_path (str): Generate into the user_events table of this DuckDB
+        database instead of writing a file (default: None)
+    compact (bool): Use COMPACT_DTYPES for the generated frame or the
+        streamed Parquet file (default: False)
+    skew (str): Skew profile name, see SKEW_PROFILES; needs the vectorized
+        engine (default: uniform)
     """
     
     print("=" * 60)
     print("GTM Event Data Generator")
     print("=" * 60)
     
+    if duckdb_path:
+        from db_manager import DuckDBManager
+        
+        print(f"\nGenerating {num_sessions:,} sessions into {duckdb_path}...")
+        with DuckDBManager(duckdb_path) as db:
+            db.create_tables()
+            return generate_into_duckdb(db, num_sessions, batch_size=batch_size, skew=skew)
+    
+    if stream and workers:
+        # gtm_event_data.parquet -> gtm_event_data/part-00000.parquet, ...
+        output_dir, extension = os.path.splitext(output_file)
+        file_format = 'csv' if extension == '.csv' else 'parquet'
+        print(f"\nGenerating {num_sessions:,} sessions into {output_dir}/ "
+              f"with {workers} workers in shards of {batch_size:,}...")
+        start = time.perf_counter()
+        shards = write_gtm_shards(output_dir, num_sessions, shard_size=batch_size,
+                                  workers=workers, file_format=file_format, skew=skew)
+        elapsed = time.perf_counter() - start
+        rows = sum(n for _, n in shards)
+        print(f"\n✓ {rows:,} rows in {len(shards)} shards exported in {elapsed:.1f}s "
+              f"({rows / elapsed:,.0f} rows/sec)")
+        return shards
+    
+    if stream:
+        print(f"\nStreaming {num_sessions:,} sessions to {output_file} in batches of {batch_size:,}...")
+        start = time.perf_counter()
+        totals = write_gtm_stream(output_file, num_sessions, batch_size=batch_size, compact=compact,
+                                  skew=skew)
+        elapsed = time.perf_counter() - start
+        
+        print("\nConversion metrics:")
+        print(f"  - Total sessions: {totals['rows']:,}")
+        print(f"  - Converted sessions: {totals['conversions']:,}")
+        print(f"  - Conversion rate: {totals['conversions'] / max(totals['rows'], 1) * 100:.2f}%")
+        print(f"  - Total revenue: ${totals['revenue']:.2f}")
+        print(f"\n✓ {totals['rows']:,} rows exported to: {output_file} in {elapsed:.1f}s")
+        return totals
+    
     # Generate synthetic data
     print("\nGenerating synthetic GTM event data...")
-    df = generate_gtm_data(num_sessions=750)
+    start = time.perf_counter()
+    df = generate_gtm_data(num_sessions=num_sessions, engine=engine, compact=compact, skew=skew)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {len(df):,} rows with the {engine} engine in {elapsed:.2f}s")
     
     # Display sample data
     print("\nSample of generated data:")
@@ -200,7 +1302,6 @@ def main():
     print(f"  - Average order value: ${df_cleaned[df_cleaned['converted']==1]['revenue'].mean():.2f}")
     
     # Export to CSV
-    output_file = 'gtm_event_data.csv'
     df_cleaned.to_csv(output_file, index=False)
     print(f"\n✓ Data exported to: {output_file}")
     
@@ -208,4 +1309,47 @@ def main():
 
 
 if __name__ == "__main__":
-    df = main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="GTM event data generator")
+    parser.add_argument('--sessions', type=int, default=750, help="Number of sessions to generate")
+    parser.add_argument('--engine', choices=['loop', 'vectorized'], default='loop',
+                        help="Row-by-row loop or whole-column NumPy generator")
+    parser.add_argument('--output', default='gtm_event_data.csv',
+                        help="Output file (.parquet for Parquet, CSV otherwise)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Write in fixed-size batches with bounded memory (vectorized engine)")
+    parser.add_argument('--batch-size', type=int, default=1_000_000, help="Rows per streamed batch")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="With --stream, generate shards in parallel processes into a directory")
+    parser.add_argument('--duckdb', default=None, metavar='DB_PATH',
+                        help="Generate directly into the user_events table of a DuckDB database")
+    parser.add_argument('--validate', default=None, metavar='CSV_PATH',
+                        help="Validate an existing CSV chunk by chunk, writing valid rows to --output")
+    parser.add_argument('--skew', choices=list(SKEW_PROFILES), default=None,
+                        help="Zipf users, skewed categories and bursty dates (vectorized engine)")
+    parser.add_argument('--compact', action='store_true',
+                        help="Integer ids, categorical category, small ints, bools, date32, float32")
+    parser.add_argument('--memory-report', action='store_true',
+                        help="Report memory_usage(deep=True) of default vs compact frames at 1M and 10M rows")
+    parser.add_argument('--preset', choices=list(PRESETS), default=None,
+                        help="Generate (or reuse from the cache) a named benchmark dataset")
+    parser.add_argument('--benchmark', nargs='*', metavar='SIZE',
+                        help="Report rows/sec of both engines for session counts or preset names")
+    args = parser.parse_args()
+    
+    if args.validate:
+        print(f"Validating {args.validate} in chunks of {args.batch_size:,} rows...")
+        validate_csv_chunked(args.validate, output_path=args.output, chunksize=args.batch_size)
+    elif args.preset:
+        print(get_preset(args.preset, skew=args.skew or 'uniform'))
+    elif args.memory_report:
+        print("Measuring frame memory...")
+        report_memory_savings()
+    elif args.benchmark is not None:
+        print("Benchmarking generator engines...")
+        benchmark_generators(args.benchmark or (750, 10_000, 100_000, 1_000_000))
+    else:
+        df = main(num_sessions=args.sessions, engine=args.engine, output_file=args.output,
+                  stream=args.stream, batch_size=args.batch_size, workers=args.workers,
+                  duckdb_path=args.duckdb, compact=args.compact, skew=args.skew)
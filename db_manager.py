@@ -1,34 +1,427 @@
+import asyncio
+import csv
 import duckdb
+import functools
+import glob
+import gzip
+import hashlib
+import numpy as np
+import os
 import pandas as pd
+import re
 from pathlib import Path
-from typing import Optional, Dict, List
-from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Union
+from datetime import date, datetime
+import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+
+# Declared types of the user_events data columns, in table and CSV column order
+# (the lineage column filename follows)
+USER_EVENTS_SCHEMA = {
+    'user_id': 'VARCHAR',
+    'session_id': 'VARCHAR',
+    'page_views': 'INTEGER',
+    'time_on_page': 'INTEGER',
+    'events_triggered': 'INTEGER',
+    'category': 'VARCHAR',
+    'is_returning': 'BOOLEAN',
+    'converted': 'BOOLEAN',
+    'revenue': 'DECIMAL(10, 2)',
+    'session_date': 'DATE'
+}
+USER_EVENTS_COLUMNS = list(USER_EVENTS_SCHEMA)
+
+# session_date formats tried in order by explicit-schema loads
+# (the generator writes ISO dates, the bundled user_events.csv uses m/d/Y)
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y']
+
+# Bump when the tables built by create_tables() change, so persistent
+# databases written by an older version are rebuilt on open
+SCHEMA_VERSION = 3
+
+# Funnel stage of a session; shared by get_conversion_funnel and the rollup
+FUNNEL_STAGE_SQL = """CASE 
+                    WHEN converted = true THEN 'Converted'
+                    WHEN time_on_page > 100 AND events_triggered > 0 AND page_views > 1 THEN 'High Engagement'
+                    WHEN events_triggered > 0 AND page_views > 1 THEN 'With Events'
+                    WHEN page_views > 1 THEN 'With Page Views'
+                    ELSE 'All Sessions'
+                END"""
+
+# HyperLogLog registers per rollup cell are 2^HLL_PRECISION; distinct-user
+# estimates have a relative standard error of about 1.04 / sqrt(2^HLL_PRECISION)
+HLL_PRECISION = 12
+HLL_RELATIVE_ERROR = 1.04 / np.sqrt(1 << HLL_PRECISION)
+
+# Appends merged into the rollup before it is compacted back to one row per key
+ROLLUP_COMPACT_EVERY = 16
+
+# Maximum sessions kept in user_events_sample for approximate queries
+SAMPLE_SIZE = 200_000
+
+# z-score of the 95% intervals reported by approximate queries
+Z_95 = 1.96
+
+# Query results kept by the DuckDBManager result cache
+CACHE_SIZE = 128
+
+# Statement types served (and cached) as reads; DESCRIBE, SUMMARIZE, SHOW and
+# comment-prefixed queries parse as SELECT
+READ_STATEMENT_TYPES = {duckdb.StatementType.SELECT, duckdb.StatementType.EXPLAIN}
+
+# Statement types that can change stored data (COPY only in its FROM form)
+WRITE_STATEMENT_TYPES = {
+    getattr(duckdb.StatementType, name)
+    for name in ('INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER', 'COPY', 'MERGE_INTO',
+                 'ATTACH', 'DETACH', 'COPY_DATABASE')
+    if hasattr(duckdb.StatementType, name)
+}
+
+# Read cursors shared by the threads of one DuckDBManager
+POOL_SIZE = 4
+
+# Files of a session_date-partitioned user_events dataset, relative to its root
+PARTITION_GLOB = "year=*/month=*/day=*/*.parquet"
+
+# Rows per Parquet row group in partition files; smaller than DuckDB's default
+# so min/max statistics can skip more of a day's file on category filters
+PARTITION_ROW_GROUP_SIZE = 32_768
+
+
+def source_fingerprint(source: Union[str, List[str]], sample_bytes: Optional[int] = 65536) -> str:
+    """
+    Fingerprint the source files of a persistent database.
+    
+    By default hashes each file's path, size and its first and last
+    sample_bytes, so appended or truncated exports and edits near either
+    end change the fingerprint without reading whole files. A same-size
+    edit in the middle of a large file (e.g. one converted flag flipped)
+    goes unnoticed; pass sample_bytes=None to hash every byte instead.
+    Modification times are left out so a copy made during a deploy still
+    matches.
+    
+    Args:
+        source: File path, glob pattern, or list of them
+        sample_bytes: Bytes hashed from each end of every file (None: all)
+        
+    Returns:
+        Hex digest over all matching files
+    """
+    patterns = [source] if isinstance(source, (str, Path)) else list(source)
+    files = sorted({path for pattern in patterns for path in glob.glob(str(pattern))})
+    if not files:
+        raise FileNotFoundError(f"No files match: {source}")
+    
+    digest = hashlib.sha256()
+    for path in files:
+        size = os.path.getsize(path)
+        digest.update(f"{path}\0{size}\0".encode())
+        with open(path, 'rb') as f:
+            if sample_bytes is None:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+                continue
+            digest.update(f.read(sample_bytes))
+            if size > sample_bytes:
+                f.seek(max(size - sample_bytes, sample_bytes))
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink a query result to compact column types.
+    
+    64-bit integers become int32 when their values fit, floats become
+    float32 when every value survives the round trip to the cent (so
+    per-session amounts and averages shrink but large totals such as
+    total_revenue stay float64), and string columns with repeated values (segments,
+    categories, user types) become categoricals.
+    
+    Args:
+        df: Query result
+        
+    Returns:
+        DataFrame with the same values in compact types
+    """
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_bool_dtype(values):
+            continue
+        if pd.api.types.is_integer_dtype(values):
+            if values.dtype.itemsize > 4 and (values.empty or (
+                    values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max)):
+                df[column] = values.astype('int32')
+        elif pd.api.types.is_float_dtype(values):
+            narrow = values.to_numpy(dtype=np.float32)
+            if np.array_equal(np.round(narrow.astype(np.float64), 2), np.round(values.to_numpy(), 2),
+                              equal_nan=True):
+                df[column] = narrow
+        elif pd.api.types.is_string_dtype(values) and values.nunique() <= len(values) // 2:
+            df[column] = values.astype('category')
+    return df
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    """
+    Session filter accepted by every DuckDBManager analytics method.
+    
+    Unset fields don't filter; set ones are ANDed. to_sql() renders them
+    as named parameters, so each method keeps one SQL text whatever the
+    filter values (one prepared statement and result cache key per value
+    set, and no user input in the SQL). The rollup keeps no per-session
+    revenue, so revenue bounds send rollup-served queries to user_events.
+    
+    Attributes:
+        start_date: First session_date to include (inclusive)
+        end_date: Last session_date to include (inclusive)
+        categories: Categories to include (a single string is allowed)
+        is_returning: Only returning (True) or new (False) users' sessions
+        min_revenue: Smallest session revenue to include
+        max_revenue: Largest session revenue to include
+    """
+    start_date: Optional[Union[str, date]] = None
+    end_date: Optional[Union[str, date]] = None
+    categories: Optional[Tuple[str, ...]] = None
+    is_returning: Optional[bool] = None
+    min_revenue: Optional[float] = None
+    max_revenue: Optional[float] = None
+    
+    def __post_init__(self):
+        # Tuples keep the filter hashable and its repr stable for cache keys
+        if isinstance(self.categories, str):
+            object.__setattr__(self, 'categories', (self.categories,))
+        elif self.categories is not None:
+            object.__setattr__(self, 'categories', tuple(self.categories))
+    
+    @property
+    def rollup_compatible(self) -> bool:
+        """Whether the rollup and its sketches can apply this filter."""
+        return self.min_revenue is None and self.max_revenue is None
+    
+    def to_sql(self) -> Tuple[str, Dict]:
+        """
+        Render the filter as a WHERE condition over user_events columns.
+        
+        Returns:
+            (condition, params): condition is "TRUE" when nothing is set;
+            params binds its $-named parameters
+        """
+        conditions, params = [], {}
+        if self.start_date is not None:
+            conditions.append("session_date >= CAST($start_date AS DATE)")
+            params['start_date'] = str(self.start_date)
+        if self.end_date is not None:
+            conditions.append("session_date <= CAST($end_date AS DATE)")
+            params['end_date'] = str(self.end_date)
+        if self.categories is not None:
+            conditions.append("list_contains($categories, category)")
+            params['categories'] = list(self.categories)
+        if self.is_returning is not None:
+            conditions.append("is_returning = $is_returning")
+            params['is_returning'] = bool(self.is_returning)
+        if self.min_revenue is not None:
+            conditions.append("revenue >= $min_revenue")
+            params['min_revenue'] = float(self.min_revenue)
+        if self.max_revenue is not None:
+            conditions.append("revenue <= $max_revenue")
+            params['max_revenue'] = float(self.max_revenue)
+        return " AND ".join(conditions) or "TRUE", params
+
 
 class DuckDBManager:
     """
     Manages DuckDB connection and analytics queries for user engagement data.
     """
     
-    def __init__(self, db_path: str = ":memory:"):
+    def __init__(self, db_path: str = ":memory:", compact_results: bool = False,
+                 read_only: bool = False, use_rollup: bool = True, approximate: bool = False,
+                 sample_size: int = SAMPLE_SIZE, cache_size: int = CACHE_SIZE,
+                 pool_size: int = POOL_SIZE):
         """
         Initialize DuckDB connection.
         
         Args:
             db_path: Path to database file or ":memory:" for in-memory DB
+            compact_results: Return query results with compact dtypes
+                (see compact_frame)
+            read_only: Open an existing database file read-only
+            use_rollup: Answer dashboard queries from user_events_rollup
+                when it exists (see refresh_rollup)
+            approximate: Answer segmentation and cohort queries from
+                user_events_sample by default (overridable per call)
+            sample_size: Maximum sessions kept in user_events_sample
+            cache_size: Query results kept in the LRU result cache (0 disables it)
+            pool_size: Cursors available to concurrent readers (see cursor)
         """
         self.db_path = db_path
-        self.conn = duckdb.connect(db_path)
-        print(f"✓ DuckDB connection established: {db_path}")
+        self.compact_results = compact_results
+        self.read_only = read_only
+        self.use_rollup = use_rollup
+        self.approximate = approximate
+        self.sample_size = sample_size
+        self._rollup_appends = 0
+        self.cache_size = cache_size
+        self.data_version = 0
+        self._cache = OrderedDict()
+        self._cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._cache_lock = threading.Lock()
+        self.conn = duckdb.connect(db_path, read_only=read_only)
+        
+        # Each cursor is its own connection to the same database, so readers
+        # on different threads run concurrently instead of sharing self.conn
+        self.pool_size = pool_size
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self.conn.cursor())
+        self._pool_stats = {'acquisitions': 0, 'waits': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+        self._pool_lock = threading.Lock()
+        print(f"✓ DuckDB connection established: {db_path}" + (" (read-only)" if read_only else ""))
     
-    def create_tables(self):
-        """Create required tables for user events analytics."""
+    @contextmanager
+    def cursor(self, timeout: Optional[float] = None):
+        """
+        Borrow a pooled cursor for the current thread.
+        
+        Blocks until one of pool_size cursors is free; the time spent
+        waiting is recorded in pool_stats().
+        
+        Args:
+            timeout: Seconds to wait before raising queue.Empty (default: forever)
+            
+        Yields:
+            DuckDB cursor on this manager's database
+        """
+        start = time.perf_counter()
+        cursor = self._pool.get(timeout=timeout)
+        waited = (time.perf_counter() - start) * 1000
+        with self._pool_lock:
+            self._pool_stats['acquisitions'] += 1
+            self._pool_stats['wait_ms_total'] += waited
+            self._pool_stats['wait_ms_max'] = max(self._pool_stats['wait_ms_max'], waited)
+            if waited >= 1:
+                self._pool_stats['waits'] += 1
+        try:
+            yield cursor
+        finally:
+            self._pool.put(cursor)
+    
+    def pool_stats(self) -> Dict:
+        """
+        Report cursor pool usage.
+        
+        Returns:
+            Dictionary with pool_size, in_use, acquisitions, waits (>= 1 ms),
+            and mean and max wait in milliseconds
+        """
+        with self._pool_lock:
+            stats = dict(self._pool_stats)
+        stats['pool_size'] = self.pool_size
+        stats['in_use'] = self.pool_size - self._pool.qsize()
+        stats['wait_ms_mean'] = round(stats['wait_ms_total'] / stats['acquisitions'], 3) if stats['acquisitions'] else 0.0
+        stats['wait_ms_total'] = round(stats['wait_ms_total'], 3)
+        stats['wait_ms_max'] = round(stats['wait_ms_max'], 3)
+        return stats
+    
+    @classmethod
+    def open_persistent(cls, db_path: str, source: Union[str, List[str]], read_only: bool = False,
+                        explicit_schema: bool = True, full_fingerprint: bool = False,
+                        **kwargs) -> "DuckDBManager":
+        """
+        Open a database file built from source, rebuilding it only when stale.
+        
+        The file's _meta table records SCHEMA_VERSION, the DuckDB version
+        (rollup sketches depend on its hash function) and the
+        source_fingerprint() of the files it was loaded from. When all match,
+        the existing file is opened and serves queries immediately; otherwise
+        it is rebuilt into a temporary file that replaces the old one once
+        loaded, so other processes never open a half-built database.
+        ":memory:" always loads from source.
+        
+        Args:
+            db_path: Database file path (or ":memory:")
+            source: CSV/Parquet path, glob, or list of them (see load_csv_data)
+            read_only: Open the (fresh) database read-only
+            explicit_schema: Load source with explicit_schema (see load_csv_data)
+            full_fingerprint: Hash whole source files, so any edit is detected
+                (see source_fingerprint)
+            **kwargs: Passed to the constructor (e.g. compact_results)
+            
+        Returns:
+            DuckDBManager connected to an up-to-date database
+        """
+        if db_path == ":memory:":
+            db = cls(db_path, **kwargs)
+            db._build(source, explicit_schema)
+            return db
+        
+        fingerprint = source_fingerprint(source, None if full_fingerprint else 65536)
+        if os.path.exists(db_path):
+            db = cls(db_path, read_only=read_only, **kwargs)
+            expected = {'schema_version': str(SCHEMA_VERSION), 'source_fingerprint': fingerprint,
+                        'duckdb_version': duckdb.__version__}
+            meta = db._meta()
+            if all(meta.get(key) == value for key, value in expected.items()):
+                print(f"✓ Reusing {db_path} (schema v{SCHEMA_VERSION}, source unchanged)")
+                return db
+            db.close()
+            print(f"✓ {db_path} is stale, rebuilding")
+        
+        temp_path = db_path + '.tmp'
+        for stale in (temp_path, temp_path + '.wal'):
+            if os.path.exists(stale):
+                os.remove(stale)
+        builder = cls(temp_path, **kwargs)
+        builder._build(source, explicit_schema)
+        builder.conn.execute(
+            "INSERT OR REPLACE INTO _meta VALUES "
+            "('source_fingerprint', ?), ('schema_version', ?), ('duckdb_version', ?)",
+            [fingerprint, str(SCHEMA_VERSION), duckdb.__version__]
+        )
+        builder.close()
+        os.replace(temp_path, db_path)
+        return cls(db_path, read_only=read_only, **kwargs)
+    
+    def _build(self, source: Union[str, List[str]], explicit_schema: bool = True):
+        """Create the tables and load source into them."""
+        self.create_tables()
+        self.load_csv_data(source, explicit_schema=explicit_schema)
+    
+    def _meta(self) -> Dict[str, str]:
+        """Return the _meta key/value pairs, or {} if the table is missing."""
+        try:
+            with self.cursor() as cursor:
+                return dict(cursor.execute("SELECT key, value FROM _meta").fetchall())
+        except duckdb.CatalogException:
+            return {}
+    
+    def create_tables(self, replace: bool = True):
+        """
+        Create required tables for user events analytics.
+        
+        Args:
+            replace: Drop and recreate user_events (default). Pass False to
+                keep existing rows, e.g. before ingest_incremental()
+        """
         
         # Drop table if exists to avoid conflicts
-        self.conn.execute("DROP TABLE IF EXISTS user_events")
+        if replace:
+            self._drop_user_events()
+            self.conn.execute("DROP TABLE IF EXISTS user_events_rejects")
+            self.conn.execute("DROP TABLE IF EXISTS user_events_rollup")
+            self.conn.execute("DROP TABLE IF EXISTS user_events_rollup_hll")
+            self.conn.execute("DROP TABLE IF EXISTS user_events_sample")
+        aggregates_existed = self._rollup_ready() and self._sample_ready()
         
         # Main user events table
         create_table_sql = """
-        CREATE TABLE user_events (
+        CREATE TABLE IF NOT EXISTS user_events (
             user_id VARCHAR,
             session_id VARCHAR,
             page_views INTEGER,
@@ -39,25 +432,933 @@ class DuckDBManager:
             converted BOOLEAN,
             revenue DECIMAL(10, 2),
             session_date DATE,
+            filename VARCHAR,
             PRIMARY KEY (session_id)
         );
         """
         
         self.conn.execute(create_table_sql)
+        
+        # Lineage column for tables created before it existed
+        if not self._user_events_is_view():
+            self.conn.execute("ALTER TABLE user_events ADD COLUMN IF NOT EXISTS filename VARCHAR")
+        
+        # Rows refused by explicit-schema loads, with raw values and the reason
+        raw_columns = ",\n            ".join(f"{column} VARCHAR" for column in USER_EVENTS_COLUMNS)
+        self.conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS user_events_rejects (
+            filename VARCHAR,
+            reason VARCHAR,
+            {raw_columns},
+            rejected_at TIMESTAMP
+        );
+        """)
+        
+        # Dashboard rollup at (session_date, category, is_returning, funnel_stage)
+        # grain; a key may span several rows until compact_rollup() merges them
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_events_rollup (
+            session_date DATE,
+            category VARCHAR,
+            is_returning BOOLEAN,
+            funnel_stage VARCHAR,
+            sessions BIGINT,
+            conversions BIGINT,
+            revenue DECIMAL(18, 2),
+            page_views BIGINT,
+            time_on_page BIGINT,
+            events_triggered BIGINT
+        );
+        """)
+        
+        # HyperLogLog registers of user_id per (session_date, category, is_returning);
+        # the max rho per register over any set of cells sketches their union
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_events_rollup_hll (
+            session_date DATE,
+            category VARCHAR,
+            is_returning BOOLEAN,
+            register SMALLINT,
+            rho TINYINT
+        );
+        """)
+        
+        # User-level sample for approximate queries: every session of each user
+        # whose hash(user_id) is at most the sample_threshold kept in _meta
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_events_sample (
+            user_id VARCHAR,
+            session_id VARCHAR,
+            page_views INTEGER,
+            time_on_page INTEGER,
+            events_triggered INTEGER,
+            category VARCHAR,
+            is_returning BOOLEAN,
+            converted BOOLEAN,
+            revenue DECIMAL(10, 2),
+            session_date DATE,
+            sample_key UBIGINT
+        );
+        """)
+        
+        # Schema version, source fingerprint and sample threshold
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS _meta (
+            key VARCHAR PRIMARY KEY,
+            value VARCHAR
+        );
+        """)
+        if not aggregates_existed:
+            self.refresh_rollup()
+        
+        # High-water mark per ingested source file
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_watermarks (
+            source VARCHAR PRIMARY KEY,
+            file_size BIGINT,
+            modified_at DOUBLE,
+            max_session_date DATE,
+            rows_ingested BIGINT,
+            ingested_at TIMESTAMP
+        );
+        """)
+        self._bump_data_version()
         print("✓ Table 'user_events' created/verified")
     
-    def load_csv_data(self, csv_path: str):
+    def _rollup_ready(self) -> bool:
+        """Return True when the rollup tables exist."""
+        with self.cursor() as cursor:
+            return cursor.execute("""
+            SELECT COUNT(*) FROM duckdb_tables()
+            WHERE table_name IN ('user_events_rollup', 'user_events_rollup_hll')
+            """).fetchone()[0] == 2
+    
+    def _sample_ready(self) -> bool:
+        """Return True when the sample table exists."""
+        with self.cursor() as cursor:
+            return cursor.execute("""
+            SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'user_events_sample'
+            """).fetchone()[0] == 1
+    
+    def _sample_threshold(self) -> Optional[int]:
+        """Return the current sample_key threshold, or None while the sample holds every row."""
+        threshold = self._meta().get('sample_threshold')
+        return int(threshold) if threshold is not None else None
+    
+    def _sample_fraction(self) -> float:
+        """Return the probability that a given user is in the sample."""
+        threshold = self._sample_threshold()
+        return 1.0 if threshold is None else (threshold + 1) / 2.0 ** 64
+    
+    def _sample_add(self, source: str, params: Optional[List] = None):
+        """
+        Add the sessions of sampled users from source to user_events_sample.
+        
+        Users are kept when hash(user_id) <= threshold, which makes the
+        sample a Bernoulli sample of users with known inclusion probability.
+        When it outgrows sample_size the threshold is lowered to the
+        sample_key of the first session past the limit.
+        """
+        threshold = self._sample_threshold()
+        keep = "TRUE" if threshold is None else f"hash(user_id) <= {threshold}"
+        self.conn.execute(f"""
+        INSERT INTO user_events_sample
+        SELECT user_id, session_id, page_views, time_on_page, events_triggered, category,
+               is_returning, converted, revenue, session_date, hash(user_id)
+        FROM {source}
+        WHERE user_id IS NOT NULL AND {keep}
+        """, params)
+        
+        if self.conn.execute("SELECT COUNT(*) FROM user_events_sample").fetchone()[0] <= self.sample_size:
+            return
+        cutoff = self.conn.execute(
+            "SELECT sample_key FROM user_events_sample ORDER BY sample_key LIMIT 1 OFFSET ?",
+            [self.sample_size]
+        ).fetchone()[0]
+        self.conn.execute("DELETE FROM user_events_sample WHERE sample_key >= ?", [cutoff])
+        self.conn.execute("INSERT OR REPLACE INTO _meta VALUES ('sample_threshold', ?)", [str(cutoff - 1)])
+    
+    def _rollup_add(self, source: str, params: Optional[List] = None):
+        """
+        Merge the aggregates of new user_events rows into the rollup tables
+        and add them to the approximate-query sample.
+        
+        Args:
+            source: Table name or parenthesized subquery with the user_events columns
+            params: Parameters of the subquery
+        """
+        m = 1 << HLL_PRECISION
+        self.conn.execute(f"""
+        INSERT INTO user_events_rollup
+        SELECT 
+            session_date,
+            category,
+            is_returning,
+            {FUNNEL_STAGE_SQL} AS funnel_stage,
+            COUNT(*),
+            SUM(CAST(converted AS INTEGER)),
+            SUM(revenue),
+            SUM(page_views),
+            SUM(time_on_page),
+            SUM(events_triggered)
+        FROM {source}
+        GROUP BY ALL
+        """, params)
+        
+        # Register = low HLL_PRECISION bits of the hash; rho = position of the
+        # first set bit in the remaining bits
+        self.conn.execute(f"""
+        INSERT INTO user_events_rollup_hll
+        SELECT session_date, category, is_returning, register, MAX(rho)
+        FROM (
+            SELECT 
+                session_date,
+                category,
+                is_returning,
+                CAST(hash(user_id) & {m - 1} AS SMALLINT) AS register,
+                CASE 
+                    WHEN hash(user_id) >> {HLL_PRECISION} = 0 THEN {65 - HLL_PRECISION}
+                    ELSE GREATEST({64 - HLL_PRECISION} - CAST(floor(log2(hash(user_id) >> {HLL_PRECISION})) AS INTEGER), 1)
+                END AS rho
+            FROM {source}
+            WHERE user_id IS NOT NULL
+        )
+        GROUP BY ALL
+        """, params)
+        
+        self._sample_add(source, params)
+        
+        self._rollup_appends += 1
+        if self._rollup_appends >= ROLLUP_COMPACT_EVERY:
+            self.compact_rollup()
+    
+    def compact_rollup(self):
+        """Merge rollup rows that share a key; costs O(rollup rows), not O(sessions)."""
+        self.conn.execute("""
+        CREATE OR REPLACE TEMP TABLE rollup_compacted AS
+        SELECT session_date, category, is_returning, funnel_stage,
+               SUM(sessions) AS sessions, SUM(conversions) AS conversions, SUM(revenue) AS revenue,
+               SUM(page_views) AS page_views, SUM(time_on_page) AS time_on_page,
+               SUM(events_triggered) AS events_triggered
+        FROM user_events_rollup
+        GROUP BY ALL
+        """)
+        self.conn.execute("""
+        CREATE OR REPLACE TEMP TABLE rollup_hll_compacted AS
+        SELECT session_date, category, is_returning, register, MAX(rho) AS rho
+        FROM user_events_rollup_hll
+        GROUP BY ALL
+        """)
+        try:
+            self.conn.execute("DELETE FROM user_events_rollup")
+            self.conn.execute("INSERT INTO user_events_rollup SELECT * FROM rollup_compacted")
+            self.conn.execute("DELETE FROM user_events_rollup_hll")
+            self.conn.execute("INSERT INTO user_events_rollup_hll SELECT * FROM rollup_hll_compacted")
+        finally:
+            self.conn.execute("DROP TABLE IF EXISTS rollup_compacted")
+            self.conn.execute("DROP TABLE IF EXISTS rollup_hll_compacted")
+        self._rollup_appends = 0
+    
+    def refresh_rollup(self, dates: Optional[List] = None):
         """
-        Load CSV data into the user_events table.
+        Rebuild the rollup tables and the sample from user_events.
+        
+        Loads and inserts maintain them; a full refresh is only needed
+        after user_events is changed directly.
         
         Args:
-            csv_path: Path to CSV file
+            dates: Only rebuild these session_dates (None in the list covers
+                NULL dates); default rebuilds everything
         """
-        # Use parameterized query to avoid path issues
-        csv_path = csv_path.replace('\\', '/')
+        self._bump_data_version()
+        if dates is None:
+            self.conn.execute("DELETE FROM user_events_rollup")
+            self.conn.execute("DELETE FROM user_events_rollup_hll")
+            self.conn.execute("DELETE FROM user_events_sample")
+            self.conn.execute("DELETE FROM _meta WHERE key = 'sample_threshold'")
+            self._rollup_add("user_events")
+            return
         
-        load_sql = f"""
-        INSERT INTO user_events
+        dates = list(dates)
+        match = "(list_contains(?, session_date) OR (session_date IS NULL AND ?))"
+        params = [[d for d in dates if d is not None], any(d is None for d in dates)]
+        self.conn.execute(f"DELETE FROM user_events_rollup WHERE {match}", params)
+        self.conn.execute(f"DELETE FROM user_events_rollup_hll WHERE {match}", params)
+        self.conn.execute(f"DELETE FROM user_events_sample WHERE {match}", params)
+        self._rollup_add(f"(SELECT * FROM user_events WHERE {match})", params)
+    
+    def _estimate_sql(self, per_user: str, group: str, totals: Dict[str, str],
+                      ratios: Dict[str, tuple], q: float) -> str:
+        """
+        Build a query estimating metrics per group from per-user sample rows.
+        
+        Each sampled user stands for 1 / q users, so totals are scaled
+        Horvitz-Thompson sums with Poisson-sampling variance
+        (1 - q) / q^2 * sum(y^2). Ratios (averages, rates) use the
+        linearized variance of sum(y) / sum(x). Every metric is followed by
+        a {metric}_moe column holding the half-width of its 95% interval.
+        
+        Args:
+            per_user: Relation with one row per (group, sampled user)
+            group: Grouping column of per_user
+            totals: Output column -> per-user value to total, or (value, decimals)
+                for non-count totals such as revenue
+            ratios: Output column -> (numerator, denominator, scale) per-user columns
+            q: Inclusion probability of a user
+        """
+        columns = []
+        for name, value in totals.items():
+            value, decimals = value if isinstance(value, tuple) else (value, None)
+            estimate = f"SUM({value}) / {q}"
+            moe = f"{Z_95} * sqrt({1 - q} * SUM(CAST({value} AS DOUBLE) ^ 2)) / {q}"
+            if decimals is None:
+                columns.append(f"CAST(ROUND({estimate}) AS BIGINT) AS {name}")
+                columns.append(f"CAST(ROUND({moe}) AS BIGINT) AS {name}_moe")
+            else:
+                columns.append(f"ROUND(CAST({estimate} AS DOUBLE), {decimals}) AS {name}")
+                columns.append(f"ROUND({moe}, {decimals}) AS {name}_moe")
+        for name, (numerator, denominator, scale) in ratios.items():
+            columns.append(f"ROUND(SUM({numerator}) / NULLIF(SUM({denominator}), 0) * {scale}, 2) AS {name}")
+            columns.append(f"ROUND({Z_95} * sqrt({1 - q} * SUM(CAST({numerator} - r_{name} * {denominator} AS DOUBLE) ^ 2))"
+                           f" / NULLIF(SUM({denominator}), 0) * {scale}, 2) AS {name}_moe")
+        group_ratios = ", ".join(
+            f"SUM({numerator}) OVER w / NULLIF(SUM({denominator}) OVER w, 0) AS r_{name}"
+            for name, (numerator, denominator, _) in ratios.items()
+        )
+        columns = ",\n            ".join(columns)
+        return f"""
+        SELECT 
+            {group},
+            {columns}
+        FROM (
+            SELECT *, {group_ratios}
+            FROM {per_user}
+            WINDOW w AS (PARTITION BY {group})
+        )
+        GROUP BY {group}
+        """
+    
+    def _hll_sql(self, group_expr: Optional[str], where: str = "TRUE",
+                 registers: Optional[str] = None) -> str:
+        """
+        Return a subquery estimating distinct users per group_expr from the rollup sketches.
+        
+        Registers of all cells matching where are union-merged (max rho per
+        register), so any date range and granularity can be answered from
+        the daily sketches. Uses the HyperLogLog estimator with linear
+        counting for small cardinalities, which is close to exact for a few
+        thousand users. registers replaces the merge with a query yielding
+        merged (grp, register, rho) rows, e.g. one using GROUPING SETS.
+        """
+        m = 1 << HLL_PRECISION
+        alpha = 0.7213 / (1 + 1.079 / m)
+        if registers is None:
+            registers = f"""
+                    SELECT {group_expr} AS grp, register, MAX(rho) AS rho
+                    FROM user_events_rollup_hll
+                    WHERE {where}
+                    GROUP BY grp, register
+                    """
+        return f"""(
+            SELECT 
+                grp,
+                CAST(ROUND(CASE 
+                    WHEN raw_estimate <= {2.5 * m} AND zeros > 0 THEN {m} * ln({m} / zeros)
+                    ELSE raw_estimate
+                END) AS BIGINT) AS unique_users
+            FROM (
+                SELECT 
+                    grp,
+                    {alpha * m * m} / ({m} - COUNT(*) + SUM(pow(2.0, -rho))) AS raw_estimate,
+                    {m} - COUNT(*) AS zeros
+                FROM ({registers})
+                GROUP BY grp
+            )
+        )"""
+    
+    def _scan_sql(self, paths: List[str], date_format: str) -> str:
+        """
+        Return a subquery that scans CSV, gzip CSV and Parquet files (or globs).
+        
+        Files are grouped by format into one read_csv_auto/read_parquet call
+        each, so DuckDB parallelizes across files, and rows come out with the
+        user_events columns plus the source filename.
+        """
+        groups = {'parquet': [], 'csv': []}
+        for path in paths:
+            path = str(path).replace('\\', '/')
+            groups['parquet' if path.lower().endswith('.parquet') else 'csv'].append(path)
+        
+        scans = []
+        for file_format, group in groups.items():
+            if not group:
+                continue
+            file_list = "[" + ", ".join("'" + p.replace("'", "''") + "'" for p in group) + "]"
+            if file_format == 'parquet':
+                source = f"read_parquet({file_list}, filename=true, union_by_name=true)"
+            else:
+                source = (f"read_csv_auto({file_list}, header=true, dateformat='{date_format}', "
+                          f"filename=true, union_by_name=true)")
+            # Normalize session_date per scan so ISO and date_format strings both parse
+            scans.append(f"""SELECT * REPLACE (COALESCE(
+                TRY_CAST(session_date AS DATE),
+                CAST(TRY_STRPTIME(CAST(session_date AS VARCHAR), '{date_format}') AS DATE)
+            ) AS session_date) FROM {source}""")
+        
+        return f"""(
+            SELECT 
+                user_id,
+                session_id,
+                CAST(page_views AS INTEGER) AS page_views,
+                CAST(time_on_page AS INTEGER) AS time_on_page,
+                CAST(events_triggered AS INTEGER) AS events_triggered,
+                category,
+                CAST(is_returning AS BOOLEAN) AS is_returning,
+                CAST(converted AS BOOLEAN) AS converted,
+                CAST(revenue AS DECIMAL(10, 2)) AS revenue,
+                session_date,
+                filename
+            FROM ({" UNION ALL BY NAME ".join(scans)})
+        )"""
+    
+    def _raw_scan_sql(self, paths: List[str]) -> str:
+        """
+        Return a subquery that reads files with the declared column layout and no sniffing.
+        
+        CSV columns are read as VARCHAR in the order of each file's header,
+        which must name exactly the USER_EVENTS_COLUMNS (in any order), and
+        selected by name; Parquet columns are cast to VARCHAR so both go
+        through the same parsing in _load_explicit().
+        """
+        csv_files = [p for p in paths if not p.lower().endswith('.parquet')]
+        parquet_files = [p for p in paths if p.lower().endswith('.parquet')]
+        quote = lambda group: "[" + ", ".join("'" + p.replace("'", "''") + "'" for p in group) + "]"
+        
+        # Files sharing a header are scanned together
+        layouts = {}
+        for path in csv_files:
+            opener = gzip.open if path.lower().endswith('.gz') else open
+            with opener(path, 'rt', newline='') as f:
+                header = tuple(name.strip() for name in next(csv.reader(f), []))
+            if sorted(header) != sorted(USER_EVENTS_COLUMNS):
+                raise ValueError(f"{path}: header {list(header)} does not match the user_events "
+                                 f"columns {USER_EVENTS_COLUMNS}")
+            layouts.setdefault(header, []).append(path)
+        
+        scans = []
+        selected = ", ".join(USER_EVENTS_COLUMNS)
+        for header, group in layouts.items():
+            columns = ", ".join(f"'{column}': 'VARCHAR'" for column in header)
+            scans.append(f"SELECT {selected}, filename FROM read_csv({quote(group)}, header=true, "
+                         f"auto_detect=false, delim=',', quote='\"', columns={{{columns}}}, filename=true)")
+        if parquet_files:
+            columns = ", ".join(f"CAST({column} AS VARCHAR) AS {column}" for column in USER_EVENTS_COLUMNS)
+            scans.append(f"SELECT {columns}, filename "
+                         f"FROM read_parquet({quote(parquet_files)}, filename=true, union_by_name=true)")
+        return "(" + " UNION ALL ".join(scans) + ")"
+    
+    def _load_explicit(self, files: List[str], date_formats: List[str]):
+        """
+        Parse raw VARCHAR rows against USER_EVENTS_SCHEMA, load the valid ones
+        and write the rest to user_events_rejects with every failure listed.
+        """
+        parsed = {}
+        for column, column_type in USER_EVENTS_SCHEMA.items():
+            value = f"NULLIF(trim(r.{column}), '')"
+            if column_type == 'INTEGER':
+                parsed[column] = (f"CASE WHEN regexp_full_match({value}, '-?[0-9]+') "
+                                  f"THEN TRY_CAST({value} AS INTEGER) END")
+            elif column_type == 'DATE':
+                parsed[column] = "COALESCE(" + ", ".join(
+                    f"CAST(TRY_STRPTIME({value}, '{date_format}') AS DATE)" for date_format in date_formats
+                ) + ")"
+            elif column_type == 'VARCHAR':
+                parsed[column] = value
+            else:
+                parsed[column] = f"TRY_CAST({value} AS {column_type})"
+        
+        failures = ", ".join(
+            f"CASE WHEN NULLIF(trim(r.{column}), '') IS NULL THEN 'missing {column}' "
+            f"WHEN {expression} IS NULL THEN 'invalid {column}: ' || r.{column} END"
+            for column, expression in parsed.items()
+        )
+        raw_columns = ", ".join(f"r.{column} AS raw_{column}" for column in USER_EVENTS_COLUMNS)
+        parsed_columns = ", ".join(f"{expression} AS {column}" for column, expression in parsed.items())
+        
+        self.conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE load_staging AS
+        WITH parsed AS (
+            SELECT {raw_columns}, {parsed_columns}, r.filename,
+                   NULLIF(concat_ws('; ', {failures}), '') AS parse_error
+            FROM {self._raw_scan_sql(files)} r
+        )
+        SELECT p.*,
+            COALESCE(
+                p.parse_error,
+                CASE 
+                    WHEN e.session_id IS NOT NULL THEN 'session_id already in user_events'
+                    WHEN row_number() OVER (
+                        PARTITION BY p.session_id ORDER BY p.parse_error IS NULL DESC, p.filename
+                    ) > 1 THEN 'duplicate session_id'
+                END
+            ) AS reason
+        FROM parsed p
+        LEFT JOIN user_events e ON e.session_id = p.session_id
+        """)
+        
+        try:
+            columns = ", ".join(USER_EVENTS_COLUMNS)
+            raw_names = ", ".join(f"raw_{column}" for column in USER_EVENTS_COLUMNS)
+            self.conn.execute(f"""
+            INSERT INTO user_events ({columns}, filename)
+            SELECT {columns}, filename FROM load_staging WHERE reason IS NULL
+            """)
+            self._rollup_add("(SELECT * FROM load_staging WHERE reason IS NULL)")
+            self.conn.execute(f"""
+            INSERT INTO user_events_rejects
+            SELECT filename, reason, {raw_names}, current_timestamp
+            FROM load_staging WHERE reason IS NOT NULL
+            """)
+            return self.conn.execute("""
+            SELECT filename,
+                   COUNT(*) FILTER (WHERE reason IS NULL) AS rows,
+                   COUNT(*) FILTER (WHERE reason IS NOT NULL) AS rejected
+            FROM load_staging
+            GROUP BY filename
+            ORDER BY filename
+            """).df()
+        finally:
+            self.conn.execute("DROP TABLE IF EXISTS load_staging")
+    
+    def load_csv_data(self, csv_path: Union[str, List[str]], date_format: str = '%m/%d/%Y',
+                      explicit_schema: bool = False,
+                      date_formats: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load CSV or Parquet files into the user_events table.
+        
+        Accepts a single path, a glob such as 'exports/*.csv.gz', or a list
+        of paths and globs; CSV, gzip CSV and Parquet may be mixed. All files
+        are loaded in one INSERT that DuckDB spreads across its threads, and
+        each row records its source file in the filename column.
+        
+        With explicit_schema=True, CSV columns are matched to USER_EVENTS_SCHEMA
+        by their header names without sniffing (a header that doesn't name
+        exactly those columns raises ValueError), every value is parsed against its declared
+        type (session_date against each of date_formats), and rows that fail
+        any check, or repeat a session_id, go to user_events_rejects with the
+        reason instead of loading with NULLs or aborting the load.
+        
+        Args:
+            csv_path: File path, glob pattern, or list of them
+            date_format: session_date format for sniffed CSV files
+            explicit_schema: Skip sniffing and route bad rows to user_events_rejects
+            date_formats: session_date formats for explicit_schema (default: DATE_FORMATS)
+            
+        Returns:
+            DataFrame with filename and rows per loaded file (plus rejected
+            rows per file with explicit_schema)
+        """
+        paths = [csv_path] if isinstance(csv_path, (str, Path)) else list(csv_path)
+        files = []
+        for path in paths:
+            files += [row[0] for row in self.conn.execute(
+                "SELECT file FROM glob(?)", [str(path).replace('\\', '/')]
+            ).fetchall()]
+        if not files:
+            raise FileNotFoundError(f"No files match: {csv_path}")
+        
+        columns = ", ".join(USER_EVENTS_COLUMNS)
+        start = time.perf_counter()
+        if explicit_schema:
+            per_file = self._load_explicit(files, date_formats or DATE_FORMATS)
+        else:
+            # Scan once; the INSERT, the rollup and the per-file counts all
+            # read the staged rows instead of re-filtering user_events
+            self.conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE load_staging AS
+            SELECT {columns}, filename
+            FROM {self._scan_sql(files, date_format)}
+            """)
+            try:
+                self.conn.execute(f"""
+                INSERT INTO user_events ({columns}, filename)
+                SELECT {columns}, filename FROM load_staging
+                """)
+                self._rollup_add("load_staging")
+                per_file = self.conn.execute("""
+                SELECT filename, COUNT(*) AS rows
+                FROM load_staging
+                GROUP BY filename
+                ORDER BY filename
+                """).df()
+            finally:
+                self.conn.execute("DROP TABLE IF EXISTS load_staging")
+        elapsed = time.perf_counter() - start
+        self._bump_data_version()
+        
+        count = int(per_file['rows'].sum())
+        threads = self.conn.execute("SELECT current_setting('threads')").fetchone()[0]
+        
+        print(f"✓ Loaded {count} records from {len(files)} file(s) in {elapsed:.2f}s "
+              f"({count / elapsed if elapsed > 0 else 0:,.0f} rows/sec, {threads} threads)")
+        if explicit_schema:
+            rejected = int(per_file['rejected'].sum())
+            print(f"  - {rejected} rejected row(s) written to user_events_rejects")
+        if len(files) > 1:
+            for filename, rows in per_file[['filename', 'rows']].head(10).itertuples(index=False):
+                print(f"  - {filename}: {rows:,} rows")
+            if len(per_file) > 10:
+                print(f"  - ... {len(per_file) - 10} more files")
+        return per_file
+    
+    def ingest_incremental(self, source_path: str, date_format: str = '%m/%d/%Y',
+                           full: bool = False) -> Dict:
+        """
+        Append new sessions and upsert changed ones from a source file.
+        
+        Unlike create_tables() + load_csv_data(), existing rows are kept. A
+        watermark per source (file size, mtime and latest session_date) is
+        stored in ingest_watermarks, and an unchanged file is skipped without
+        reading it. Otherwise every row of the file is staged, since exports
+        carry late-arriving sessions with old dates. Staged rows are
+        deduplicated on session_id and anti-joined against user_events, and
+        only sessions that are new or differ from the stored row are written
+        with INSERT OR REPLACE, so the writes and rollup refresh cost the delta.
+        
+        Args:
+            source_path: CSV, gzip CSV or Parquet file in the user_events schema
+            date_format: session_date format for CSV sources
+            full: Ingest the file even if its size and mtime are unchanged
+            
+        Returns:
+            Dictionary with staged, inserted, updated and unchanged row counts
+            and the new max_session_date (all zero if the file was skipped)
+        """
+        source = str(Path(source_path).resolve())
+        stat = Path(source_path).stat()
+        watermark = None
+        if self.conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'ingest_watermarks'"
+        ).fetchone()[0]:
+            watermark = self.conn.execute(
+                "SELECT file_size, modified_at, max_session_date FROM ingest_watermarks WHERE source = ?",
+                [source]
+            ).fetchone()
+        
+        stats = {'source': source, 'staged': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0,
+                 'max_session_date': watermark[2] if watermark else None}
+        # Checked before create_tables(), which bumps data_version, so a
+        # skipped ingest keeps the result cache
+        if not full and watermark and watermark[0] == stat.st_size and watermark[1] == stat.st_mtime:
+            print(f"✓ {source_path} unchanged since last ingest, skipped")
+            return stats
+        
+        self.create_tables(replace=False)
+        self.conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE ingest_staging AS
+        SELECT * FROM {self._scan_sql([source_path], date_format)}
+        WHERE session_id IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY session_id ORDER BY session_date DESC) = 1
+        """)
+        
+        try:
+            stats['staged'], stats['inserted'], stats['updated'] = self.conn.execute("""
+            SELECT 
+                COUNT(*),
+                COUNT(*) FILTER (WHERE e.session_id IS NULL),
+                COUNT(*) FILTER (WHERE e.session_id IS NOT NULL AND
+                    (s.user_id, s.page_views, s.time_on_page, s.events_triggered, s.category,
+                     s.is_returning, s.converted, s.revenue, s.session_date)
+                    IS DISTINCT FROM
+                    (e.user_id, e.page_views, e.time_on_page, e.events_triggered, e.category,
+                     e.is_returning, e.converted, e.revenue, e.session_date))
+            FROM ingest_staging s
+            LEFT JOIN user_events e USING (session_id)
+            """).fetchone()
+            stats['unchanged'] = stats['staged'] - stats['inserted'] - stats['updated']
+            
+            # Staged sessions that are new or differ from the stored row
+            changed = """
+            NOT EXISTS (
+                SELECT 1 FROM user_events e
+                WHERE e.session_id = s.session_id
+                  AND (e.user_id, e.page_views, e.time_on_page, e.events_triggered, e.category,
+                       e.is_returning, e.converted, e.revenue, e.session_date)
+                      IS NOT DISTINCT FROM
+                      (s.user_id, s.page_views, s.time_on_page, s.events_triggered, s.category,
+                       s.is_returning, s.converted, s.revenue, s.session_date)
+            )
+            """
+            
+            # Rollup cells of the written rows and of the rows they replace,
+            # read before the upsert overwrites the old dates
+            affected_dates = [row[0] for row in self.conn.execute(f"""
+            WITH written AS (SELECT s.* FROM ingest_staging s WHERE {changed})
+            SELECT session_date FROM written
+            UNION
+            SELECT e.session_date FROM user_events e JOIN written w USING (session_id)
+            """).fetchall()]
+            
+            # Only new and changed sessions are written
+            self.conn.execute(f"""
+            INSERT OR REPLACE INTO user_events
+            SELECT s.user_id, s.session_id, s.page_views, s.time_on_page, s.events_triggered,
+                   s.category, s.is_returning, s.converted, s.revenue, s.session_date, s.filename
+            FROM ingest_staging s
+            WHERE {changed}
+            """)
+            
+            if stats['inserted'] or stats['updated']:
+                self.refresh_rollup(affected_dates)
+                self._bump_data_version()
+            
+            latest = self.conn.execute("SELECT MAX(session_date) FROM ingest_staging").fetchone()[0]
+            if latest is not None and (stats['max_session_date'] is None or latest > stats['max_session_date']):
+                stats['max_session_date'] = latest
+            self.conn.execute("""
+            INSERT OR REPLACE INTO ingest_watermarks
+            VALUES (?, ?, ?, ?, ?, current_timestamp)
+            """, [source, stat.st_size, stat.st_mtime, stats['max_session_date'], stats['staged']])
+        finally:
+            self.conn.execute("DROP TABLE IF EXISTS ingest_staging")
+        
+        print(f"✓ Ingested {source_path}: {stats['inserted']} new, {stats['updated']} updated, "
+              f"{stats['unchanged']} unchanged of {stats['staged']} staged rows")
+        return stats
+    
+    def _fetch_df(self, query: str, params: Optional[Union[List, Dict]] = None) -> pd.DataFrame:
+        """
+        Run a query and return its result as a DataFrame.
+        
+        Statements are classified by DuckDB's parser. Reads (SELECT, which
+        includes DESCRIBE, SUMMARIZE and SHOW, and EXPLAIN) run on a pooled
+        cursor and are served from an LRU cache keyed on the exact SQL text,
+        the parameters and data_version, which every load bumps, so cached
+        results never outlive the data they were computed from. Callers get
+        a copy, so the cached frame stays intact. Other statements run
+        uncached on the main connection; those that can change data bump
+        data_version, and when they write to user_events the rollup, sketches
+        and sample are rebuilt so they match it (never on a read-only
+        connection, which cannot hold such writes anyway).
+        """
+        statements = duckdb.extract_statements(query)
+        kinds = {statement.type for statement in statements}
+        if not kinds <= READ_STATEMENT_TYPES:
+            df = self.conn.execute(query, params).df()
+            writes = any(
+                statement.type in WRITE_STATEMENT_TYPES and not (
+                    statement.type == duckdb.StatementType.COPY
+                    and not re.match(r'\s*COPY\s+\S+(\s*\([^)]*\))?\s+FROM\b', statement.query, re.IGNORECASE)
+                )
+                for statement in statements
+            )
+            if not writes:
+                return compact_frame(df) if self.compact_results else df
+            self._bump_data_version()
+            touches_events = any(re.search(r'\buser_events\b', statement.query, re.IGNORECASE)
+                                 for statement in statements if statement.type in WRITE_STATEMENT_TYPES)
+            if touches_events and not self.read_only and self._rollup_ready():
+                try:
+                    self.refresh_rollup()
+                except duckdb.CatalogException:
+                    pass  # user_events itself was dropped
+            return compact_frame(df) if self.compact_results else df
+        
+        # Normalizing whitespace would also merge different string literals
+        key = (query, repr(params), self.data_version)
+        if self.cache_size > 0:
+            with self._cache_lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    self._cache_stats['hits'] += 1
+                    return self._cache[key].copy()
+                self._cache_stats['misses'] += 1
+        
+        with self.cursor() as cursor:
+            df = cursor.execute(query, params).df()
+        df = compact_frame(df) if self.compact_results else df
+        if self.cache_size <= 0:
+            return df
+        
+        with self._cache_lock:
+            # A load may have bumped the version while the query ran
+            if key[2] == self.data_version:
+                self._cache[key] = df
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                    self._cache_stats['evictions'] += 1
+        return df.copy()
+    
+    def _bump_data_version(self):
+        """Mark the data as changed; cached results of older versions are dropped."""
+        with self._cache_lock:
+            self.data_version += 1
+            self._cache.clear()
+    
+    def cache_stats(self) -> Dict:
+        """
+        Report result cache effectiveness.
+        
+        Returns:
+            Dictionary with hits, misses, evictions, entries, hit_rate and data_version
+        """
+        with self._cache_lock:
+            stats = dict(self._cache_stats)
+            stats['entries'] = len(self._cache)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['data_version'] = self.data_version
+        return stats
+    
+    def clear_cache(self):
+        """Drop all cached query results."""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def insert_dataframe(self, data) -> int:
+        """
+        Insert rows from an in-memory frame into the user_events table.
+        
+        Accepts anything DuckDB can scan directly (pandas DataFrame, Arrow
+        Table or RecordBatchReader) with the data_generator schema, so
+        generated data never goes through CSV serialization and sniffing.
+        A RecordBatchReader can only be read once, so it is staged in a
+        temporary table that feeds both the insert and the rollup. When
+        user_events is attached to a partitioned dataset (see
+        attach_partitioned), the rows are written as new partition files.
+        
+        Args:
+            data: Frame with the user_events columns
+            
+        Returns:
+            Number of rows inserted
+        """
+        self.conn.register("incoming_events", data)
+        try:
+            source = "incoming_events"
+            if hasattr(data, 'read_next_batch'):
+                self.conn.execute("CREATE OR REPLACE TEMP TABLE incoming_staging AS SELECT * FROM incoming_events")
+                source = "incoming_staging"
+            typed = f"""(
+            SELECT 
+                user_id,
+                session_id,
+                page_views,
+                time_on_page,
+                events_triggered,
+                category,
+                CAST(is_returning AS BOOLEAN) AS is_returning,
+                CAST(converted AS BOOLEAN) AS converted,
+                CAST(revenue AS DECIMAL(10, 2)) AS revenue,
+                CAST(session_date AS DATE) AS session_date
+            FROM {source}
+            )"""
+            partitioned_path = self._meta().get('partitioned_path')
+            if partitioned_path:
+                # Stage once: the rows feed both the new partition files and the rollup
+                self.conn.execute(f"CREATE OR REPLACE TEMP TABLE incoming_staging AS SELECT * FROM {typed}")
+                typed = "incoming_staging"
+                inserted = self._write_partitions(
+                    f"(SELECT *, CAST(NULL AS VARCHAR) AS filename FROM {typed})", partitioned_path
+                )
+            else:
+                inserted = self.conn.execute(f"""
+                INSERT INTO user_events (user_id, session_id, page_views, time_on_page, events_triggered,
+                                         category, is_returning, converted, revenue, session_date)
+                SELECT * FROM {typed};
+                """).fetchone()[0]
+            self._rollup_add(typed)
+            self._bump_data_version()
+        finally:
+            self.conn.unregister("incoming_events")
+            self.conn.execute("DROP TABLE IF EXISTS incoming_staging")
+        return inserted
+    
+    def _user_events_is_view(self) -> bool:
+        """Return True when user_events is a view over a partitioned dataset."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM duckdb_views() WHERE view_name = 'user_events' AND NOT internal"
+        ).fetchone()[0] == 1
+    
+    def _drop_user_events(self):
+        """Drop user_events, whether it is a table or a view over a partitioned dataset."""
+        if self._user_events_is_view():
+            self.conn.execute("DROP VIEW user_events")
+            self.conn.execute("DELETE FROM _meta WHERE key = 'partitioned_path'")
+        else:
+            self.conn.execute("DROP TABLE IF EXISTS user_events")
+    
+    def _write_partitions(self, source: str, path: str) -> int:
+        """Append source rows (user_events columns) to the dataset at path as new Parquet files."""
+        columns = ", ".join(USER_EVENTS_COLUMNS + ['filename'])
+        target = path.replace("'", "''")
+        return self.conn.execute(f"""
+        COPY (
+            SELECT 
+                {columns},
+                year(session_date) AS year,
+                month(session_date) AS month,
+                day(session_date) AS day
+            FROM {source}
+            ORDER BY session_date, category, is_returning
+        ) TO '{target}' (
+            FORMAT PARQUET,
+            PARTITION_BY (year, month, day),
+            APPEND,
+            FILENAME_PATTERN 'part-{{uuid}}',
+            ROW_GROUP_SIZE {PARTITION_ROW_GROUP_SIZE}
+        )
+        """).fetchone()[0]
+    
+    def export_partitioned(self, path: str) -> int:
+        """
+        Write user_events as Parquet files partitioned by session_date.
+        
+        Rows go to year=YYYY/month=M/day=D directories under path, sorted by
+        date, category and user type so row-group min/max statistics let
+        DuckDB skip row groups within a day. Files get unique names and are
+        added next to any already there; compact_partitioned() merges them.
+        
+        Args:
+            path: Dataset root directory
+            
+        Returns:
+            Number of rows written
+        """
+        start = time.perf_counter()
+        written = self._write_partitions("user_events", path)
+        elapsed = time.perf_counter() - start
+        print(f"✓ Exported {written:,} records to {path} in {elapsed:.2f}s")
+        return written
+    
+    def attach_partitioned(self, path: str, refresh: bool = True):
+        """
+        Replace the user_events table with a view over a partitioned dataset.
+        
+        session_date is derived from the year/month/day directory names, so
+        date filters (including EventFilter's) prune whole partitions before
+        any file is opened, and the remaining files skip row groups by their
+        statistics. The view re-lists the files on every query, so new
+        partition files are picked up without re-attaching. The view does
+        not enforce the session_id primary key, and load_csv_data() and
+        ingest_incremental() need the table; insert_dataframe() appends new
+        partition files instead.
+        
+        Args:
+            path: Dataset root directory (see export_partitioned)
+            refresh: Rebuild the rollup and sample from the dataset; pass
+                False when it was exported from the current user_events
+        """
+        path = os.path.abspath(path)
+        if not glob.glob(os.path.join(path, PARTITION_GLOB)):
+            raise FileNotFoundError(f"No partition files under: {path}")
+        
+        # Rollup, sample and _meta must exist before user_events is swapped out
+        self.create_tables(replace=False)
+        self._drop_user_events()
+        files = os.path.join(path, PARTITION_GLOB).replace('\\', '/').replace("'", "''")
+        self.conn.execute(f"""
+        CREATE VIEW user_events AS
         SELECT 
             user_id,
             session_id,
@@ -65,27 +1366,164 @@ class DuckDBManager:
             time_on_page,
             events_triggered,
             category,
-            CAST(is_returning AS BOOLEAN),
-            CAST(converted AS BOOLEAN),
+            is_returning,
+            converted,
             revenue,
-            TRY_CAST(session_date AS DATE) as session_date
-        FROM read_csv_auto('{csv_path}', 
-            header=true,
-            dateformat='%m/%d/%Y'
-        );
+            make_date(year, month, day) AS session_date,
+            filename
+        FROM read_parquet('{files}', hive_partitioning = true,
+                          hive_types = {{'year': INTEGER, 'month': INTEGER, 'day': INTEGER}})
+        """)
+        self.conn.execute("INSERT OR REPLACE INTO _meta VALUES ('partitioned_path', ?)", [path])
+        if refresh:
+            self.refresh_rollup()
+        else:
+            self._bump_data_version()
+        print(f"✓ user_events attached to partitioned dataset: {path}")
+    
+    def compact_partitioned(self, path: Optional[str] = None, min_files: int = 2) -> pd.DataFrame:
+        """
+        Merge the files of each partition into one.
+        
+        Every insert into a partitioned user_events adds a small file per
+        day it touches; rewriting a day's files as one sorted file keeps
+        scans from paying per-file overhead. The merged file is renamed into
+        place before the old ones are removed, so readers never miss rows
+        (but may briefly count them twice). Data is unchanged, so the
+        rollup and cached results stay valid.
+        
+        Args:
+            path: Dataset root (default: the attached dataset)
+            min_files: Only merge partitions with at least this many files
+            
+        Returns:
+            DataFrame with partition, files merged and rows per compacted partition
         """
+        path = path or self._meta().get('partitioned_path')
+        if not path:
+            raise ValueError("No partitioned dataset attached; pass path")
+        
+        partitions = {}
+        for file in glob.glob(os.path.join(path, PARTITION_GLOB)):
+            partitions.setdefault(os.path.dirname(file), []).append(file)
+        
+        results = []
+        start = time.perf_counter()
+        for partition, files in sorted(partitions.items()):
+            if len(files) < min_files:
+                continue
+            merged = os.path.join(partition, f"part-compacted-{int(time.time() * 1000)}.parquet")
+            temp = (merged + '.tmp').replace("'", "''")
+            rows = self.conn.execute(f"""
+            COPY (
+                SELECT * FROM read_parquet(?, hive_partitioning = false)
+                ORDER BY session_date, category, is_returning
+            ) TO '{temp}' (FORMAT PARQUET, ROW_GROUP_SIZE {PARTITION_ROW_GROUP_SIZE})
+            """, [files]).fetchone()[0]
+            os.replace(merged + '.tmp', merged)
+            for file in files:
+                os.remove(file)
+            results.append({'partition': os.path.relpath(partition, path), 'files': len(files), 'rows': rows})
+        elapsed = time.perf_counter() - start
         
-        self.conn.execute(load_sql)
-        count = self.conn.execute("SELECT COUNT(*) FROM user_events").fetchone()[0]
-        print(f"✓ Loaded {count} records from CSV")
+        print(f"✓ Compacted {len(results)} partition(s) of {path} in {elapsed:.2f}s")
+        return pd.DataFrame(results, columns=['partition', 'files', 'rows'])
     
-    def get_engagement_segmentation(self) -> pd.DataFrame:
+    def _use_sample(self, approximate: Optional[bool]) -> bool:
+        """Resolve a per-call approximate flag against the manager default."""
+        approximate = self.approximate if approximate is None else approximate
+        return approximate and self._sample_ready()
+    
+    def _use_rollup(self, filters: EventFilter) -> bool:
+        """Whether a query under filters can be served from the rollup."""
+        return self.use_rollup and filters.rollup_compatible and self._rollup_ready()
+    
+    def get_engagement_segmentation(self, filters: Optional[EventFilter] = None,
+                                    approximate: Optional[bool] = None) -> pd.DataFrame:
         """
         Segment users by engagement level (low/medium/high).
         
         Engagement score = (page_views * 0.3) + (time_on_page * 0.4) + (events_triggered * 0.3)
+        
+        In approximate mode the segment cut-offs come from approx_quantile
+        over user_events_sample and every metric is a scaled sample estimate
+        followed by a {metric}_moe column (95% interval half-width; cut-off
+        uncertainty is not included). Cut-offs are computed over the
+        filtered sessions.
+        
+        Args:
+            filters: Sessions to include (default: all)
+            approximate: Use the sample (default: the manager's approximate setting)
         """
-        query = """
+        where, params = (filters or EventFilter()).to_sql()
+        if self._use_sample(approximate):
+            per_user = f"""(
+                WITH sample AS (
+                    SELECT 
+                        user_id,
+                        page_views,
+                        time_on_page,
+                        events_triggered,
+                        (page_views * 0.3 + time_on_page * 0.4 + events_triggered * 0.3) AS engagement_score,
+                        CAST(converted AS INTEGER) AS converted,
+                        revenue
+                    FROM user_events_sample
+                    WHERE {where}
+                ),
+                percentiles AS (
+                    SELECT 
+                        approx_quantile(engagement_score, 0.33) AS p33,
+                        approx_quantile(engagement_score, 0.67) AS p67
+                    FROM sample
+                )
+                SELECT 
+                    CASE 
+                        WHEN e.engagement_score <= p.p33 THEN 'Low'
+                        WHEN e.engagement_score <= p.p67 THEN 'Medium'
+                        ELSE 'High'
+                    END AS engagement_segment,
+                    e.user_id,
+                    COUNT(*) AS sessions,
+                    SUM(e.page_views) AS page_views,
+                    SUM(e.time_on_page) AS time_on_page,
+                    SUM(e.events_triggered) AS events_triggered,
+                    SUM(e.engagement_score) AS engagement_score,
+                    SUM(e.converted) AS conversions,
+                    SUM(e.revenue) AS revenue
+                FROM sample e
+                CROSS JOIN percentiles p
+                GROUP BY engagement_segment, e.user_id
+            )"""
+            query = self._estimate_sql(
+                per_user, 'engagement_segment',
+                totals={'unique_users': '1', 'total_sessions': 'sessions'},
+                ratios={
+                    'avg_page_views': ('page_views', 'sessions', 1),
+                    'avg_time_on_page': ('time_on_page', 'sessions', 1),
+                    'avg_events': ('events_triggered', 'sessions', 1),
+                    'avg_engagement_score': ('engagement_score', 'sessions', 1),
+                    'conversion_rate': ('conversions', 'sessions', 100)
+                },
+                q=self._sample_fraction()
+            )
+            totals = self._estimate_sql(
+                per_user, 'engagement_segment',
+                totals={'conversions': 'conversions', 'total_revenue': ('revenue', 2)}, ratios={},
+                q=self._sample_fraction()
+            )
+            query = f"""
+            SELECT *
+            FROM ({query}) JOIN ({totals}) USING (engagement_segment)
+            ORDER BY 
+                CASE engagement_segment
+                    WHEN 'High' THEN 1
+                    WHEN 'Medium' THEN 2
+                    WHEN 'Low' THEN 3
+                END;
+            """
+            return self._fetch_df(query, params)
+        
+        query = f"""
         WITH engagement_scores AS (
             SELECT 
                 user_id,
@@ -97,6 +1535,7 @@ class DuckDBManager:
                 converted,
                 revenue
             FROM user_events
+            WHERE {where}
         ),
         percentiles AS (
             SELECT 
@@ -130,13 +1569,45 @@ class DuckDBManager:
             END;
         """
         
-        return self.conn.execute(query).df()
+        return self._fetch_df(query, params)
     
-    def get_user_type_breakdown(self) -> pd.DataFrame:
+    def get_user_type_breakdown(self, filters: Optional[EventFilter] = None) -> pd.DataFrame:
         """
         Analyze metrics by user type (new vs returning).
+        
+        Served from the rollup when available (unique_users is then a
+        HyperLogLog estimate).
+        
+        Args:
+            filters: Sessions to include (default: all)
         """
-        query = """
+        filters = filters or EventFilter()
+        where, params = filters.to_sql()
+        if self._use_rollup(filters):
+            query = f"""
+            SELECT 
+                CASE 
+                    WHEN r.is_returning THEN 'Returning'
+                    ELSE 'New'
+                END AS user_type,
+                u.unique_users,
+                CAST(SUM(r.sessions) AS BIGINT) AS total_sessions,
+                ROUND(SUM(r.page_views) / SUM(r.sessions), 2) AS avg_page_views,
+                ROUND(SUM(r.time_on_page) / SUM(r.sessions), 2) AS avg_time_on_page,
+                ROUND(SUM(r.events_triggered) / SUM(r.sessions), 2) AS avg_events,
+                SUM(r.conversions) AS conversions,
+                ROUND(SUM(r.conversions) / SUM(r.sessions) * 100, 2) AS conversion_rate,
+                ROUND(SUM(r.revenue), 2) AS total_revenue,
+                ROUND(SUM(r.revenue) / SUM(r.sessions), 2) AS avg_revenue_per_session
+            FROM user_events_rollup r
+            LEFT JOIN {self._hll_sql('is_returning', where)} u ON u.grp IS NOT DISTINCT FROM r.is_returning
+            WHERE {where}
+            GROUP BY user_type, u.unique_users
+            ORDER BY user_type DESC;
+            """
+            return self._fetch_df(query, params)
+        
+        query = f"""
         SELECT 
             CASE 
                 WHEN is_returning THEN 'Returning'
@@ -152,17 +1623,48 @@ class DuckDBManager:
             ROUND(SUM(revenue), 2) AS total_revenue,
             ROUND(AVG(revenue), 2) AS avg_revenue_per_session
         FROM user_events
+        WHERE {where}
         GROUP BY user_type
         ORDER BY user_type DESC;
         """
         
-        return self.conn.execute(query).df()
+        return self._fetch_df(query, params)
     
-    def get_category_performance(self) -> pd.DataFrame:
+    def get_category_performance(self, filters: Optional[EventFilter] = None) -> pd.DataFrame:
         """
         Analyze performance metrics by product category.
+        
+        Served from the rollup when available (unique_users is then a
+        HyperLogLog estimate).
+        
+        Args:
+            filters: Sessions to include (default: all)
         """
-        query = """
+        filters = filters or EventFilter()
+        where, params = filters.to_sql()
+        if self._use_rollup(filters):
+            query = f"""
+            SELECT 
+                r.category,
+                u.unique_users,
+                CAST(SUM(r.sessions) AS BIGINT) AS total_sessions,
+                ROUND(SUM(r.page_views) / SUM(r.sessions), 2) AS avg_page_views,
+                ROUND(SUM(r.time_on_page) / SUM(r.sessions), 2) AS avg_time_on_page,
+                ROUND(SUM(r.events_triggered) / SUM(r.sessions), 2) AS avg_events,
+                SUM(r.conversions) AS conversions,
+                ROUND(SUM(r.conversions) / SUM(r.sessions) * 100, 2) AS conversion_rate,
+                ROUND(SUM(r.revenue), 2) AS total_revenue,
+                ROUND(SUM(r.revenue) / SUM(r.sessions), 2) AS avg_revenue_per_session,
+                ROUND(SUM(r.revenue) / NULLIF(SUM(r.conversions), 0), 2) AS avg_order_value
+            FROM user_events_rollup r
+            LEFT JOIN {self._hll_sql('category', where)} u ON u.grp IS NOT DISTINCT FROM r.category
+            WHERE {where}
+            GROUP BY r.category, u.unique_users
+            ORDER BY total_revenue DESC;
+            """
+            return self._fetch_df(query, params)
+        
+        query = f"""
         SELECT 
             category,
             COUNT(DISTINCT user_id) AS unique_users,
@@ -176,25 +1678,82 @@ class DuckDBManager:
             ROUND(AVG(revenue), 2) AS avg_revenue_per_session,
             ROUND(SUM(revenue) / NULLIF(SUM(CAST(converted AS INTEGER)), 0), 2) AS avg_order_value
         FROM user_events
+        WHERE {where}
         GROUP BY category
         ORDER BY total_revenue DESC;
         """
         
-        return self.conn.execute(query).df()
+        return self._fetch_df(query, params)
     
-    def get_timeseries_conversion(self, granularity: str = 'day') -> pd.DataFrame:
+    def get_timeseries_conversion(self, granularity: str = 'day',
+                                  filters: Optional[EventFilter] = None, last_n: Optional[int] = None,
+                                  start_date=None, end_date=None) -> pd.DataFrame:
         """
         Get time-series conversion data.
         
+        Served from the rollup when available (unique_users is then a
+        HyperLogLog estimate). The window is applied as a session_date
+        bound in SQL, so only its rows (or rollup cells, or partitions) are
+        read. last_n counts calendar periods back from the latest one with
+        sessions; periods without sessions are not filled in, so fewer rows
+        can come back.
+        
         Args:
             granularity: 'day', 'week', or 'month'
+            filters: Sessions to include (default: all)
+            last_n: Only the last N periods
+            start_date: First session_date to include; overrides filters
+            end_date: Last session_date to include; overrides filters
         """
+        filters = filters or EventFilter()
+        overrides = {'start_date': start_date, 'end_date': end_date}
+        filters = replace(filters, **{field: value for field, value in overrides.items() if value is not None})
         date_trunc = {
             'day': 'day',
             'week': 'week',
             'month': 'month'
         }.get(granularity, 'day')
         
+        if last_n is not None:
+            if int(last_n) < 1:
+                raise ValueError(f"last_n must be at least 1, got {last_n!r}")
+            # The rollup holds every session_date, so the latest one is cheap to find there
+            where, params = filters.to_sql()
+            source = "user_events_rollup" if self._use_rollup(filters) else "user_events"
+            cutoff = self._fetch_df(f"""
+            SELECT CAST(date_trunc('{date_trunc}', MAX(session_date))
+                        - INTERVAL {int(last_n) - 1} {date_trunc.upper()} AS DATE) AS cutoff
+            FROM {source}
+            WHERE {where}
+            """, params)['cutoff'].iloc[0]
+            # A bound parameter (unlike a subquery) still prunes partitions
+            if pd.notna(cutoff) and (filters.start_date is None
+                                     or pd.Timestamp(cutoff) > pd.Timestamp(filters.start_date)):
+                filters = replace(filters, start_date=pd.Timestamp(cutoff).date())
+        where, params = filters.to_sql()
+        
+        if self._use_rollup(filters):
+            query = f"""
+            SELECT 
+                date_trunc('{date_trunc}', r.session_date) AS period,
+                CAST(SUM(r.sessions) AS BIGINT) AS total_sessions,
+                u.unique_users,
+                SUM(r.conversions) AS conversions,
+                ROUND(SUM(r.conversions) / SUM(r.sessions) * 100, 2) AS conversion_rate,
+                ROUND(SUM(r.revenue), 2) AS total_revenue,
+                ROUND(SUM(r.page_views) / SUM(r.sessions), 2) AS avg_page_views,
+                ROUND(SUM(r.time_on_page) / SUM(r.sessions), 2) AS avg_time_on_page,
+                SUM(CASE WHEN r.is_returning THEN r.sessions ELSE 0 END) AS returning_sessions,
+                SUM(CASE WHEN NOT r.is_returning THEN r.sessions ELSE 0 END) AS new_sessions
+            FROM user_events_rollup r
+            LEFT JOIN {self._hll_sql(f"date_trunc('{date_trunc}', session_date)", where)} u
+                ON u.grp IS NOT DISTINCT FROM date_trunc('{date_trunc}', r.session_date)
+            WHERE {where}
+            GROUP BY period, u.unique_users
+            ORDER BY period;
+            """
+            return self._fetch_df(query, params)
+        
         query = f"""
         SELECT 
             date_trunc('{date_trunc}', session_date) AS period,
@@ -208,32 +1767,49 @@ class DuckDBManager:
             SUM(CASE WHEN is_returning THEN 1 ELSE 0 END) AS returning_sessions,
             SUM(CASE WHEN NOT is_returning THEN 1 ELSE 0 END) AS new_sessions
         FROM user_events
+        WHERE {where}
         GROUP BY period
         ORDER BY period;
         """
         
-        return self.conn.execute(query).df()
+        return self._fetch_df(query, params)
     
-    def get_conversion_funnel(self) -> pd.DataFrame:
+    def get_conversion_funnel(self, filters: Optional[EventFilter] = None) -> pd.DataFrame:
         """
         Analyze conversion funnel stages with proper funnel progression.
+        
+        Served from the rollup when available.
+        
+        Args:
+            filters: Sessions to include (default: all)
         """
-        query = """
-        WITH funnel_stages AS (
+        filters = filters or EventFilter()
+        where, params = filters.to_sql()
+        if self._use_rollup(filters):
+            stages = f"""
             SELECT 
-                CASE 
-                    WHEN converted = true THEN 'Converted'
-                    WHEN time_on_page > 100 AND events_triggered > 0 AND page_views > 1 THEN 'High Engagement'
-                    WHEN events_triggered > 0 AND page_views > 1 THEN 'With Events'
-                    WHEN page_views > 1 THEN 'With Page Views'
-                    ELSE 'All Sessions'
-                END AS funnel_stage,
+                funnel_stage,
+                CAST(SUM(sessions) AS BIGINT) AS sessions,
+                SUM(conversions) AS conversions,
+                SUM(revenue) AS revenue
+            FROM user_events_rollup
+            WHERE {where}
+            GROUP BY funnel_stage
+            """
+        else:
+            stages = f"""
+            SELECT 
+                {FUNNEL_STAGE_SQL} AS funnel_stage,
                 COUNT(*) AS sessions,
                 SUM(CAST(converted AS INTEGER)) AS conversions,
                 SUM(revenue) AS revenue
             FROM user_events
+            WHERE {where}
             GROUP BY funnel_stage
-        )
+            """
+        
+        query = f"""
+        WITH funnel_stages AS ({stages})
         SELECT 
             funnel_stage,
             sessions,
@@ -250,13 +1826,344 @@ class DuckDBManager:
             END;
         """
         
-        return self.conn.execute(query).df()
+        return self._fetch_df(query, params)
+    
+    def get_summary_stats(self, filters: Optional[EventFilter] = None) -> pd.DataFrame:
+        """
+        Get headline KPIs over all sessions (one row).
+        
+        Served from the rollup when available (unique_users is then a
+        HyperLogLog estimate).
+        
+        Args:
+            filters: Sessions to include (default: all)
+        """
+        filters = filters or EventFilter()
+        where, params = filters.to_sql()
+        if self._use_rollup(filters):
+            query = f"""
+            SELECT 
+                CAST(SUM(sessions) AS BIGINT) AS total_sessions,
+                (SELECT unique_users FROM {self._hll_sql('1', where)}) AS unique_users,
+                SUM(conversions) AS total_conversions,
+                ROUND(SUM(conversions) / SUM(sessions) * 100, 2) AS conversion_rate,
+                ROUND(SUM(revenue), 2) AS total_revenue,
+                ROUND(SUM(revenue) / SUM(sessions), 2) AS avg_revenue_per_session,
+                ROUND(SUM(page_views) / SUM(sessions), 2) AS avg_page_views,
+                ROUND(SUM(time_on_page) / SUM(sessions), 2) AS avg_time_on_page
+            FROM user_events_rollup
+            WHERE {where}
+            """
+            return self._fetch_df(query, params)
+        
+        query = f"""
+        SELECT 
+            COUNT(*) AS total_sessions,
+            COUNT(DISTINCT user_id) AS unique_users,
+            SUM(CAST(converted AS INTEGER)) AS total_conversions,
+            ROUND(AVG(CAST(converted AS FLOAT)) * 100, 2) AS conversion_rate,
+            ROUND(SUM(revenue), 2) AS total_revenue,
+            ROUND(AVG(revenue), 2) AS avg_revenue_per_session,
+            ROUND(AVG(page_views), 2) AS avg_page_views,
+            ROUND(AVG(time_on_page), 2) AS avg_time_on_page
+        FROM user_events
+        WHERE {where}
+        """
+        
+        return self._fetch_df(query, params)
+    
+    def get_dashboard_metrics(self, filters: Optional[EventFilter] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Compute the summary, category, user type and funnel views in one pass.
+        
+        A single GROUPING SETS query over (category), (is_returning),
+        (funnel_stage) and the grand total reads the rollup (or user_events)
+        once instead of once per getter, and is cached as one result. Each
+        piece has the columns and order of the matching getter.
+        
+        Args:
+            filters: Sessions to include (default: all)
+            
+        Returns:
+            Dictionary with 'summary' (get_summary_stats), 'category'
+            (get_category_performance), 'user_type' (get_user_type_breakdown)
+            and 'funnel' (get_conversion_funnel) DataFrames
+        """
+        filters = filters or EventFilter()
+        where, params = filters.to_sql()
+        if self._use_rollup(filters):
+            # Sketches merge per grouping set in one pass over the HLL table too
+            users = self._hll_sql(None, registers=f"""
+                    SELECT 
+                        {{'g_category': GROUPING(category), 'g_returning': GROUPING(is_returning),
+                          'category': category, 'is_returning': is_returning}} AS grp,
+                        register,
+                        MAX(rho) AS rho
+                    FROM user_events_rollup_hll
+                    WHERE {where}
+                    GROUP BY GROUPING SETS ((register), (category, register), (is_returning, register))
+                    """)
+            query = f"""
+            WITH cells AS (
+                SELECT 
+                    GROUPING(category) AS g_category,
+                    GROUPING(is_returning) AS g_returning,
+                    GROUPING(funnel_stage) AS g_stage,
+                    category,
+                    is_returning,
+                    funnel_stage,
+                    CAST(SUM(sessions) AS BIGINT) AS total_sessions,
+                    ROUND(SUM(page_views) / SUM(sessions), 2) AS avg_page_views,
+                    ROUND(SUM(time_on_page) / SUM(sessions), 2) AS avg_time_on_page,
+                    ROUND(SUM(events_triggered) / SUM(sessions), 2) AS avg_events,
+                    SUM(conversions) AS conversions,
+                    ROUND(SUM(conversions) / SUM(sessions) * 100, 2) AS conversion_rate,
+                    ROUND((SUM(conversions)::FLOAT / SUM(sessions)) * 100, 2) AS funnel_conversion_rate,
+                    ROUND(SUM(revenue), 2) AS total_revenue,
+                    ROUND(SUM(revenue) / SUM(sessions), 2) AS avg_revenue_per_session,
+                    ROUND(SUM(revenue) / NULLIF(SUM(conversions), 0), 2) AS avg_order_value
+                FROM user_events_rollup
+                WHERE {where}
+                GROUP BY GROUPING SETS ((), (category), (is_returning), (funnel_stage))
+            )
+            SELECT 
+                c.*,
+                COALESCE(u.unique_users, 0) AS unique_users
+            FROM cells c
+            LEFT JOIN {users} u
+                ON c.g_stage = 1
+                AND u.grp.g_category = c.g_category
+                AND u.grp.g_returning = c.g_returning
+                AND u.grp.category IS NOT DISTINCT FROM c.category
+                AND u.grp.is_returning IS NOT DISTINCT FROM c.is_returning
+            """
+        else:
+            query = f"""
+            SELECT 
+                GROUPING(category) AS g_category,
+                GROUPING(is_returning) AS g_returning,
+                GROUPING(funnel_stage) AS g_stage,
+                category,
+                is_returning,
+                funnel_stage,
+                COUNT(*) AS total_sessions,
+                ROUND(AVG(page_views), 2) AS avg_page_views,
+                ROUND(AVG(time_on_page), 2) AS avg_time_on_page,
+                ROUND(AVG(events_triggered), 2) AS avg_events,
+                SUM(CAST(converted AS INTEGER)) AS conversions,
+                ROUND(AVG(CAST(converted AS FLOAT)) * 100, 2) AS conversion_rate,
+                ROUND((SUM(CAST(converted AS INTEGER))::FLOAT / COUNT(*)) * 100, 2) AS funnel_conversion_rate,
+                ROUND(SUM(revenue), 2) AS total_revenue,
+                ROUND(AVG(revenue), 2) AS avg_revenue_per_session,
+                ROUND(SUM(revenue) / NULLIF(SUM(CAST(converted AS INTEGER)), 0), 2) AS avg_order_value,
+                COUNT(DISTINCT user_id) AS unique_users
+            FROM (SELECT *, {FUNNEL_STAGE_SQL} AS funnel_stage FROM user_events WHERE {where})
+            GROUP BY GROUPING SETS ((), (category), (is_returning), (funnel_stage))
+            """
+        cells = self._fetch_df(query, params)
+        
+        totals = cells[(cells['g_category'] == 1) & (cells['g_returning'] == 1) & (cells['g_stage'] == 1)]
+        summary = totals.rename(columns={'conversions': 'total_conversions'})[[
+            'total_sessions', 'unique_users', 'total_conversions', 'conversion_rate',
+            'total_revenue', 'avg_revenue_per_session', 'avg_page_views', 'avg_time_on_page'
+        ]]
+        
+        per_user = ['unique_users', 'total_sessions', 'avg_page_views', 'avg_time_on_page', 'avg_events',
+                    'conversions', 'conversion_rate', 'total_revenue', 'avg_revenue_per_session']
+        category = cells[cells['g_category'] == 0].sort_values('total_revenue', ascending=False)
+        category = category[['category'] + per_user + ['avg_order_value']]
+        
+        user_type = cells[cells['g_returning'] == 0].assign(
+            user_type=lambda df: np.where(df['is_returning'].astype(bool), 'Returning', 'New')
+        ).sort_values('user_type', ascending=False)
+        user_type = user_type[['user_type'] + per_user]
+        
+        stage_order = ['All Sessions', 'With Page Views', 'With Events', 'High Engagement', 'Converted']
+        funnel = cells[cells['g_stage'] == 0].assign(
+            stage_rank=lambda df: df['funnel_stage'].map(stage_order.index)
+        ).sort_values('stage_rank')
+        funnel = funnel[['funnel_stage', 'total_sessions', 'funnel_conversion_rate', 'total_revenue']].rename(
+            columns={'total_sessions': 'sessions', 'funnel_conversion_rate': 'conversion_rate',
+                     'total_revenue': 'revenue'}
+        )
+        
+        return {
+            name: piece.reset_index(drop=True)
+            for name, piece in (('summary', summary), ('category', category),
+                                ('user_type', user_type), ('funnel', funnel))
+        }
+    
+    def get_date_range(self, filters: Optional[EventFilter] = None) -> pd.DataFrame:
+        """
+        Get the first and last session_date (one row).
+        
+        Read from the rollup when available, so it costs O(days x cells)
+        rather than a scan of user_events.
+        
+        Args:
+            filters: Sessions to include (default: all)
+        """
+        filters = filters or EventFilter()
+        where, params = filters.to_sql()
+        source = "user_events_rollup" if self._use_rollup(filters) else "user_events"
+        return self._fetch_df(f"""
+        SELECT 
+            MIN(session_date) AS first_date,
+            MAX(session_date) AS last_date
+        FROM {source}
+        WHERE {where}
+        """, params)
+    
+    def get_unique_users(self, granularity: Optional[str] = 'day', start_date=None, end_date=None,
+                         category: Optional[Union[str, List[str]]] = None,
+                         is_returning: Optional[bool] = None, exact: bool = False,
+                         filters: Optional[EventFilter] = None) -> pd.DataFrame:
+        """
+        Count distinct users per day, week or month from the HyperLogLog sketches.
+        
+        Daily sketches per (category, user type) are union-merged for the
+        requested range and filters, so weekly and monthly counts are not
+        sums of daily counts. Estimates have a relative standard error of
+        HLL_RELATIVE_ERROR (about 1.6%); users_low/users_high give the 95%
+        interval. Small counts fall in the linear-counting range and are
+        usually much closer than that. exact=True (or a manager without the
+        rollup, or revenue bounds in filters) scans user_events with
+        COUNT(DISTINCT) instead.
+        
+        Args:
+            granularity: 'day', 'week', 'month' or None for one total row
+            start_date: First session_date to include (inclusive)
+            end_date: Last session_date to include (inclusive)
+            category: Category or list of categories to include
+            is_returning: Only returning (True) or new (False) users' sessions
+            exact: Count exactly from user_events
+            filters: Sessions to include; the arguments above override its fields
+            
+        Returns:
+            DataFrame with period (unless granularity is None), unique_users,
+            users_low and users_high
+        """
+        overrides = {'start_date': start_date, 'end_date': end_date, 'categories': category,
+                     'is_returning': is_returning}
+        filters = replace(filters or EventFilter(),
+                          **{field: value for field, value in overrides.items() if value is not None})
+        where, params = filters.to_sql()
+        
+        if granularity is None:
+            group_expr = "1"
+        elif granularity in ('day', 'week', 'month'):
+            group_expr = f"date_trunc('{granularity}', session_date)"
+        else:
+            raise ValueError(f"Unknown granularity: {granularity!r} (expected 'day', 'week', 'month' or None)")
+        
+        if exact or not filters.rollup_compatible or not self._rollup_ready():
+            counts = f"""(
+                SELECT {group_expr} AS grp, COUNT(DISTINCT user_id) AS unique_users
+                FROM user_events
+                WHERE {where}
+                GROUP BY grp
+            )"""
+            margin = 0.0
+        else:
+            counts = self._hll_sql(group_expr, where)
+            margin = 1.96 * HLL_RELATIVE_ERROR
+        
+        period = "" if granularity is None else "grp AS period, "
+        return self._fetch_df(f"""
+        SELECT 
+            {period}unique_users,
+            CAST(FLOOR(unique_users * (1 - {margin})) AS BIGINT) AS users_low,
+            CAST(CEIL(unique_users * (1 + {margin})) AS BIGINT) AS users_high
+        FROM {counts}
+        ORDER BY grp
+        """, params)
     
-    def get_cohort_analysis(self) -> pd.DataFrame:
+    def get_cohort_analysis(self, filters: Optional[EventFilter] = None,
+                            approximate: Optional[bool] = None) -> pd.DataFrame:
         """
         Perform cohort analysis based on first session date.
+        
+        Cohorts are assigned from each user's first session overall; filters
+        restrict the activity counted in them.
+        
+        In approximate mode cohorts come from the users in
+        user_events_sample (whose full history is sampled, so first-session
+        dates are exact); totals are scaled estimates followed by {metric}_moe
+        columns, while days_active and avg_conversion_rate are read off the
+        sample as is.
+        
+        Args:
+            filters: Sessions to include (default: all)
+            approximate: Use the sample (default: the manager's approximate setting)
         """
-        query = """
+        where, params = (filters or EventFilter()).to_sql()
+        if self._use_sample(approximate):
+            q = self._sample_fraction()
+            per_user = f"""(
+                WITH user_first_session AS (
+                    SELECT user_id, MIN(session_date) AS cohort_date
+                    FROM user_events_sample
+                    GROUP BY user_id
+                )
+                SELECT 
+                    date_trunc('month', ufs.cohort_date) AS cohort_month,
+                    s.user_id,
+                    COUNT(DISTINCT s.session_date) AS active_days,
+                    SUM(CAST(s.converted AS INTEGER)) AS conversions,
+                    SUM(s.revenue) AS revenue
+                FROM user_events_sample s
+                JOIN user_first_session ufs ON s.user_id = ufs.user_id
+                WHERE {where}
+                GROUP BY cohort_month, s.user_id
+            )"""
+            estimates = self._estimate_sql(
+                per_user, 'cohort_month',
+                totals={'total_active_users': 'active_days', 'total_conversions': 'conversions',
+                        'total_revenue': ('revenue', 2)},
+                ratios={}, q=q
+            )
+            query = f"""
+            WITH user_first_session AS (
+                SELECT user_id, MIN(session_date) AS cohort_date
+                FROM user_events_sample
+                GROUP BY user_id
+            ),
+            cohort_data AS (
+                SELECT 
+                    date_trunc('month', ufs.cohort_date) AS cohort_month,
+                    s.session_date,
+                    COUNT(DISTINCT s.user_id) AS active_users,
+                    SUM(CAST(s.converted AS INTEGER)) AS conversions
+                FROM user_events_sample s
+                JOIN user_first_session ufs ON s.user_id = ufs.user_id
+                WHERE {where}
+                GROUP BY cohort_month, s.session_date
+            ),
+            observed AS (
+                SELECT 
+                    cohort_month,
+                    COUNT(DISTINCT session_date) AS days_active,
+                    ROUND(AVG(CAST(conversions AS FLOAT) / NULLIF(active_users, 0)) * 100, 2) AS avg_conversion_rate
+                FROM cohort_data
+                GROUP BY cohort_month
+            )
+            SELECT 
+                o.cohort_month,
+                o.days_active,
+                e.total_active_users,
+                e.total_active_users_moe,
+                e.total_conversions,
+                e.total_conversions_moe,
+                o.avg_conversion_rate,
+                e.total_revenue,
+                e.total_revenue_moe
+            FROM observed o
+            JOIN ({estimates}) e USING (cohort_month)
+            ORDER BY cohort_month;
+            """
+            return self._fetch_df(query, params)
+        
+        query = f"""
         WITH user_first_session AS (
             SELECT 
                 user_id,
@@ -273,6 +2180,7 @@ class DuckDBManager:
                 ROUND(SUM(ue.revenue), 2) AS revenue
             FROM user_events ue
             JOIN user_first_session ufs ON ue.user_id = ufs.user_id
+            WHERE {where}
             GROUP BY cohort_month, ue.session_date
         )
         SELECT 
@@ -287,7 +2195,39 @@ class DuckDBManager:
         ORDER BY cohort_month;
         """
         
-        return self.conn.execute(query).df()
+        return self._fetch_df(query, params)
+    
+    def benchmark(self, methods: Optional[List[str]] = None, repeats: int = 3) -> pd.DataFrame:
+        """
+        Time analytics methods against the current data.
+        
+        Args:
+            methods: Method names to time (default: every get_* analytics method)
+            repeats: Runs per method (uncached); the best and mean are reported
+            
+        Returns:
+            DataFrame with method, best_ms, mean_ms and result rows
+        """
+        methods = methods or [
+            'get_engagement_segmentation', 'get_user_type_breakdown', 'get_category_performance',
+            'get_timeseries_conversion', 'get_conversion_funnel', 'get_cohort_analysis',
+            'get_summary_stats'
+        ]
+        results = []
+        for method in methods:
+            timings = []
+            for _ in range(repeats):
+                self.clear_cache()
+                start = time.perf_counter()
+                result = getattr(self, method)()
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append({
+                'method': method,
+                'best_ms': round(min(timings), 2),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'rows': len(result)
+            })
+        return pd.DataFrame(results)
     
     def execute_custom_query(self, query: str) -> pd.DataFrame:
         """
@@ -299,10 +2239,12 @@ class DuckDBManager:
         Returns:
             DataFrame with query results
         """
-        return self.conn.execute(query).df()
+        return self._fetch_df(query)
     
     def close(self):
-        """Close the database connection."""
+        """Close the pooled cursors and the database connection."""
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
         self.conn.close()
         print("✓ Database connection closed")
     
@@ -315,6 +2257,82 @@ class DuckDBManager:
         self.close()
 
 
+
+class AsyncDuckDBManager:
+    """
+    Asyncio facade over a DuckDBManager for running dashboard panels concurrently.
+    
+    Every call runs on a worker thread and reads through one of the
+    manager's pooled cursors, so independent queries overlap and a page
+    costs roughly its slowest query rather than the sum of all of them.
+    Any get_* method (and execute_custom_query) is available as a
+    coroutine with the same arguments.
+    """
+    
+    def __init__(self, db: DuckDBManager, max_workers: Optional[int] = None):
+        """
+        Wrap a manager.
+        
+        Args:
+            db: Manager whose methods are run
+            max_workers: Worker threads (default: the manager's pool_size)
+        """
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or db.pool_size,
+                                            thread_name_prefix="duckdb-async")
+    
+    async def run(self, method: str, *args, **kwargs):
+        """
+        Run a manager method on a worker thread.
+        
+        Args:
+            method: DuckDBManager method name, e.g. 'get_category_performance'
+            *args, **kwargs: Passed to the method
+            
+        Returns:
+            The method's result
+        """
+        call = functools.partial(getattr(self.db, method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+    
+    def __getattr__(self, name: str):
+        if name.startswith('get_') or name == 'execute_custom_query':
+            async def call(*args, **kwargs):
+                return await self.run(name, *args, **kwargs)
+            return call
+        raise AttributeError(name)
+    
+    async def gather(self, *calls) -> List:
+        """
+        Run several manager calls concurrently.
+        
+        Args:
+            *calls: Method names, or (method, *args) tuples
+            
+        Returns:
+            Results in the order of calls
+        """
+        return await asyncio.gather(*(
+            self.run(call) if isinstance(call, str) else self.run(*call) for call in calls
+        ))
+    
+    def fetch(self, *calls) -> List:
+        """
+        Blocking gather() for code without a running event loop (e.g. a Streamlit script).
+        
+        Args:
+            *calls: Method names, or (method, *args) tuples
+            
+        Returns:
+            Results in the order of calls
+        """
+        return asyncio.run(self.gather(*calls))
+    
+    def close(self):
+        """Stop the worker threads (the wrapped manager stays open)."""
+        self._executor.shutdown(wait=True)
+
+
 # Example usage
 if __name__ == "__main__":
     # Initialize manager
@@ -0,0 +1,262 @@
+import pandas as pd
+import numpy as np
+import os
+import socket
+import time
+
+from data_generator import clean_and_validate_data, iter_gtm_batches
+from hit_generator import iter_hit_batches
+
+
+class DirectorySink:
+    """
+    Write each micro-batch as its own file in a directory.
+    
+    Files are written under a temporary name and renamed into place, so a
+    watcher never sees a partially written batch.
+    """
+    
+    def __init__(self, path: str, file_format: str = 'parquet'):
+        if file_format not in ('parquet', 'csv'):
+            raise ValueError(f"Unknown file format: {file_format!r} (expected 'parquet' or 'csv')")
+        self.path = path
+        self.file_format = file_format
+        self.batches = 0
+        os.makedirs(path, exist_ok=True)
+    
+    def write(self, batch: pd.DataFrame):
+        final_path = os.path.join(self.path, f"batch-{self.batches:08d}.{self.file_format}")
+        temp_path = final_path + '.tmp'
+        if self.file_format == 'parquet':
+            batch.to_parquet(temp_path, index=False)
+        else:
+            batch.to_csv(temp_path, index=False)
+        os.replace(temp_path, final_path)
+        self.batches += 1
+    
+    def close(self):
+        pass
+
+
+class SocketSink:
+    """
+    Stream micro-batches over TCP as CSV lines, header first.
+    """
+    
+    def __init__(self, host: str, port: int):
+        self.sock = socket.create_connection((host, port))
+        self.header_sent = False
+    
+    def write(self, batch: pd.DataFrame):
+        payload = batch.to_csv(index=False, header=not self.header_sent)
+        self.sock.sendall(payload.encode('utf-8'))
+        self.header_sent = True
+    
+    def close(self):
+        self.sock.close()
+
+
+class DuckDBSink:
+    """
+    Insert micro-batches into a DuckDB table.
+    
+    Sessions go through DuckDBManager.insert_dataframe into user_events;
+    hits go into a hit_events table created from the first batch.
+    session_offset is the highest session_NNNNNN number already in
+    user_events, so replayed sessions are numbered after it instead of
+    colliding with the primary key.
+    """
+    
+    def __init__(self, db, level: str = 'session', close_db: bool = False):
+        self.db = db
+        self.level = level
+        self.close_db = close_db
+        self.hits_table_ready = False
+        self.session_offset = 0
+        if level == 'session':
+            self.session_offset = db.conn.execute("""
+            SELECT COALESCE(MAX(TRY_CAST(regexp_extract(session_id, '^session_([0-9]+)$', 1) AS BIGINT)), 0)
+            FROM user_events
+            """).fetchone()[0]
+    
+    def write(self, batch: pd.DataFrame):
+        if self.level == 'session':
+            self.db.insert_dataframe(batch)
+            return
+        
+        self.db.conn.register("incoming_hits", batch)
+        try:
+            if not self.hits_table_ready:
+                self.db.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS hit_events AS SELECT * FROM incoming_hits LIMIT 0"
+                )
+                self.hits_table_ready = True
+            self.db.conn.execute("INSERT INTO hit_events SELECT * FROM incoming_hits")
+        finally:
+            self.db.conn.unregister("incoming_hits")
+    
+    def close(self):
+        if self.close_db:
+            self.db.close()
+
+
+def open_sink(spec: str, level: str = 'session'):
+    """
+    Build a sink from a command-line spec
+    
+    Parameters:
+    spec (str): 'dir:PATH[:csv]', 'socket:HOST:PORT' or 'duckdb:DB_PATH'
+    level (str): 'session' or 'hit' (decides the DuckDB table)
+    
+    Returns:
+    Sink with write(batch) and close()
+    """
+    
+    kind, _, target = spec.partition(':')
+    if kind == 'dir':
+        path, _, file_format = target.partition(':')
+        return DirectorySink(path, file_format or 'parquet')
+    if kind == 'socket':
+        host, _, port = target.rpartition(':')
+        return SocketSink(host or 'localhost', int(port))
+    if kind == 'duckdb':
+        from db_manager import DuckDBManager
+        
+        db = DuckDBManager(target)
+        if level == 'session':
+            # Append to an existing database (e.g. the dashboard's) rather than wiping it
+            db.create_tables(replace=False)
+        return DuckDBSink(db, level, close_db=True)
+    raise ValueError(f"Unknown sink: {spec!r} (expected dir:, socket: or duckdb:)")
+
+
+def _micro_batches(frames, size):
+    """Re-slice an iterable of DataFrames into batches of exactly size rows (last may be short)."""
+    pending = []
+    pending_rows = 0
+    for frame in frames:
+        pending.append(frame)
+        pending_rows += len(frame)
+        if pending_rows < size:
+            continue
+        frame = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+        full = (len(frame) // size) * size
+        for start in range(0, full, size):
+            yield frame.iloc[start:start + size]
+        pending = [frame.iloc[full:]]
+        pending_rows = len(pending[0])
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def replay(sink, rate=50_000, duration=60.0, level='session', batch_interval=0.1, seed=42):
+    """
+    Emit generated sessions or hits into a sink at a fixed rate
+    
+    Micro-batches of rate * batch_interval rows are scheduled on a fixed
+    timeline from the start of the run; the replay sleeps when ahead and
+    emits back to back when behind, so a slow sink shows up as lag rather
+    than a silently lower rate.
+    
+    Session ids continue after the sink's session_offset, if it has one,
+    so replays can append to a database that already holds sessions.
+    
+    Parameters:
+    sink: Object with write(batch) and close(), e.g. from open_sink()
+    rate (float): Target rows per second (default: 50,000)
+    duration (float): Seconds of data to emit (default: 60)
+    level (str): 'session' rows or 'hit' rows (default: 'session')
+    batch_interval (float): Seconds of data per micro-batch (default: 0.1)
+    seed (int): Master seed (default: 42)
+    
+    Returns:
+    dict: Rows, batches, elapsed seconds, target and achieved rows/sec,
+        lag percentiles (seconds behind schedule when a batch finished)
+        and mean sink write time
+    """
+    
+    if level not in ('session', 'hit'):
+        raise ValueError(f"Unknown level: {level!r} (expected 'session' or 'hit')")
+    
+    total_rows = int(rate * duration)
+    batch_rows = max(int(rate * batch_interval), 1)
+    
+    # Hits average ~12 per session, so expand enough sessions to cover total_rows
+    if level == 'session':
+        session_offset = getattr(sink, 'session_offset', 0)
+        frames = (clean_and_validate_data(batch, verbose=False)
+                  for batch in iter_gtm_batches(total_rows, max(batch_rows, 100_000), seed,
+                                                session_offset=session_offset))
+    else:
+        frames = iter_hit_batches(max(total_rows // 8, 1), 100_000, seed)
+    
+    lags = []
+    write_seconds = []
+    emitted = 0
+    start = time.perf_counter()
+    try:
+        for batch in _micro_batches(frames, batch_rows):
+            batch = batch.iloc[:total_rows - emitted]
+            if batch.empty:
+                break
+            
+            # Wait for this batch's slot on the timeline
+            due = start + emitted / rate
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            
+            write_start = time.perf_counter()
+            sink.write(batch)
+            finished = time.perf_counter()
+            
+            emitted += len(batch)
+            write_seconds.append(finished - write_start)
+            lags.append(max(finished - (start + emitted / rate), 0.0))
+            if emitted >= total_rows:
+                break
+    finally:
+        sink.close()
+    
+    # The run lasts at least its scheduled window, so a sink that keeps up
+    # reports the target rate rather than the rate of the last write
+    elapsed = max(time.perf_counter(), start + emitted / rate) - start
+    report = {
+        'rows': emitted,
+        'batches': len(lags),
+        'elapsed_sec': round(elapsed, 3),
+        'target_rows_per_sec': rate,
+        'achieved_rows_per_sec': round(emitted / elapsed) if elapsed > 0 else 0,
+        'lag_p50_sec': round(float(np.percentile(lags, 50)), 4) if lags else 0.0,
+        'lag_p95_sec': round(float(np.percentile(lags, 95)), 4) if lags else 0.0,
+        'lag_max_sec': round(max(lags), 4) if lags else 0.0,
+        'mean_write_sec': round(float(np.mean(write_seconds)), 4) if write_seconds else 0.0
+    }
+    
+    print(f"✓ Replayed {report['rows']:,} {level} rows in {report['batches']:,} batches "
+          f"over {report['elapsed_sec']:.1f}s")
+    print(f"  - Throughput: {report['achieved_rows_per_sec']:,} rows/sec "
+          f"(target {rate:,.0f})")
+    print(f"  - Lag: p50 {report['lag_p50_sec']:.3f}s, p95 {report['lag_p95_sec']:.3f}s, "
+          f"max {report['lag_max_sec']:.3f}s")
+    print(f"  - Mean sink write: {report['mean_write_sec'] * 1000:.1f} ms/batch")
+    
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Rate-controlled replay of synthetic GTM data")
+    parser.add_argument('--sink', required=True,
+                        help="dir:PATH[:csv], socket:HOST:PORT or duckdb:DB_PATH")
+    parser.add_argument('--rate', type=float, default=50_000, help="Target rows per second")
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds of data to emit")
+    parser.add_argument('--level', choices=['session', 'hit'], default='session',
+                        help="Replay session rows or hit-level events")
+    parser.add_argument('--batch-interval', type=float, default=0.1,
+                        help="Seconds of data per micro-batch")
+    args = parser.parse_args()
+    
+    replay(open_sink(args.sink, args.level), rate=args.rate, duration=args.duration,
+           level=args.level, batch_interval=args.batch_interval)
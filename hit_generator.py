@@ -0,0 +1,217 @@
+import pandas as pd
+import numpy as np
+import time
+
+from data_generator import (
+    CATEGORIES,
+    clean_and_validate_data,
+    iter_gtm_batches,
+    write_batches,
+)
+
+# Hit types; every session starts with a page_view
+EVENT_TYPES = ['page_view', 'click', 'scroll', 'form_submit', 'add_to_cart']
+
+# Mix of the non-page_view interactions counted in events_triggered
+INTERACTION_WEIGHTS = [0.5, 0.3, 0.1, 0.1]
+
+# Longest session in page views, which bounds the page paths per category
+MAX_PAGES = 20
+
+# One path per (category, page number), e.g. '/home-and-garden/page-3'
+PAGE_PATHS = [
+    f"/{category.lower().replace(' & ', '-and-').replace(' ', '-')}/page-{page}"
+    for category in CATEGORIES
+    for page in range(1, MAX_PAGES + 1)
+]
+
+SESSION_COLUMNS = ['user_id', 'session_id', 'page_views', 'time_on_page', 'events_triggered',
+                   'category', 'is_returning', 'converted', 'revenue', 'session_date']
+
+
+def generate_hit_events(sessions, seed=42):
+    """
+    Expand session rows into individual GTM hits
+    
+    Each session yields page_views 'page_view' hits and events_triggered
+    interaction hits, evenly interleaved and starting with a page_view.
+    time_on_page is split across the hits as engagement_time, timestamps
+    advance by the engagement time of the previous hit, and a converted
+    session carries its revenue on its last hit. rollup_hit_events()
+    reproduces the input sessions exactly.
+    
+    Parameters:
+    sessions (pd.DataFrame): Validated sessions in the generate_gtm_data schema
+    seed (int or np.random.SeedSequence): Random seed (default: 42)
+    
+    Returns:
+    pd.DataFrame: One row per hit with event_timestamp, event_type, page,
+        session_id, user_id, category, is_returning, engagement_time,
+        is_conversion and revenue
+    """
+    
+    rng = np.random.default_rng(seed)
+    
+    page_views = sessions['page_views'].to_numpy(dtype=np.int64)
+    events = sessions['events_triggered'].to_numpy(dtype=np.int64)
+    time_on_page = sessions['time_on_page'].to_numpy(dtype=np.int64)
+    num_sessions = len(sessions)
+    
+    # Hit index ranges per session
+    hits = page_views + events
+    ends = np.cumsum(hits)
+    starts = ends - hits
+    num_hits = int(ends[-1]) if num_sessions else 0
+    session_idx = np.repeat(np.arange(num_sessions), hits)
+    position = np.arange(num_hits) - starts[session_idx]
+    
+    # Hit k of T is a page_view when ceil((k + 1) * P / T) > ceil(k * P / T),
+    # which spreads exactly P page_views over the session and makes hit 0 one
+    total = hits[session_idx]
+    pages = page_views[session_idx]
+    is_page_view = -(-(position + 1) * pages // total) > -(-position * pages // total)
+    
+    # Interactions stay on the page of the latest page_view
+    page_count = np.cumsum(is_page_view)
+    page_number = page_count - (page_count[starts] - is_page_view[starts])[session_idx]
+    
+    event_codes = np.where(
+        is_page_view, 0, 1 + rng.choice(len(INTERACTION_WEIGHTS), size=num_hits, p=INTERACTION_WEIGHTS)
+    )
+    
+    category_codes = pd.Categorical(sessions['category'], categories=CATEGORIES).codes.astype(np.int64)
+    page_codes = category_codes[session_idx] * MAX_PAGES + np.minimum(page_number, MAX_PAGES) - 1
+    
+    # Split time_on_page across hits with random weights; the cumulative
+    # share is floored so the per-hit seconds sum to time_on_page exactly
+    weights = rng.exponential(size=num_hits)
+    cumulative = np.cumsum(weights)
+    before = (cumulative[starts] - weights[starts])[session_idx]
+    session_weight = (cumulative[ends - 1] - cumulative[starts] + weights[starts])[session_idx]
+    seconds = time_on_page[session_idx]
+    elapsed = np.minimum(np.floor((cumulative - before) / session_weight * seconds), seconds)
+    elapsed = elapsed.astype(np.int64)
+    elapsed[ends - 1] = time_on_page
+    elapsed_before = np.empty_like(elapsed)
+    elapsed_before[1:] = elapsed[:-1]
+    elapsed_before[starts] = 0
+    
+    # Sessions start at a random second of their day and end the same day
+    session_dates = pd.to_datetime(sessions['session_date'], format='%Y-%m-%d').to_numpy()
+    start_offsets = (rng.random(num_sessions) * (86400 - time_on_page)).astype(np.int64)
+    session_start = session_dates.astype('datetime64[s]') + start_offsets.astype('timedelta64[s]')
+    
+    # Revenue and the conversion flag sit on the last hit of converted sessions
+    converted = sessions['converted'].to_numpy(dtype=np.int64)
+    is_conversion = np.zeros(num_hits, dtype=np.int64)
+    is_conversion[ends - 1] = converted
+    revenue = np.zeros(num_hits)
+    revenue[ends - 1] = np.where(converted == 1, sessions['revenue'].to_numpy(dtype=float), 0.0)
+    
+    return pd.DataFrame({
+        'event_timestamp': session_start[session_idx] + elapsed_before.astype('timedelta64[s]'),
+        'event_type': pd.Categorical.from_codes(event_codes, categories=EVENT_TYPES),
+        'page': pd.Categorical.from_codes(page_codes, categories=PAGE_PATHS),
+        'session_id': sessions['session_id'].to_numpy()[session_idx],
+        'user_id': sessions['user_id'].to_numpy()[session_idx],
+        'category': pd.Categorical.from_codes(category_codes[session_idx], categories=CATEGORIES),
+        'is_returning': sessions['is_returning'].to_numpy(dtype=np.int64)[session_idx],
+        'engagement_time': elapsed - elapsed_before,
+        'is_conversion': is_conversion,
+        'revenue': revenue
+    })
+
+
+def rollup_hit_events(hits):
+    """
+    Aggregate hits back into the session schema of generate_gtm_data
+    
+    Parameters:
+    hits (pd.DataFrame): Hits from generate_hit_events
+    
+    Returns:
+    pd.DataFrame: One row per session
+    """
+    
+    is_page_view = (hits['event_type'] == 'page_view').to_numpy()
+    sessions = hits.assign(
+        _page_view=is_page_view.astype(np.int64),
+        _interaction=(~is_page_view).astype(np.int64)
+    ).groupby('session_id', sort=False, observed=True).agg(
+        user_id=('user_id', 'first'),
+        page_views=('_page_view', 'sum'),
+        time_on_page=('engagement_time', 'sum'),
+        events_triggered=('_interaction', 'sum'),
+        category=('category', 'first'),
+        is_returning=('is_returning', 'first'),
+        converted=('is_conversion', 'max'),
+        revenue=('revenue', 'sum'),
+        session_date=('event_timestamp', 'min')
+    ).reset_index()
+    
+    sessions['category'] = sessions['category'].astype(str)
+    sessions['revenue'] = sessions['revenue'].round(2)
+    sessions['session_date'] = sessions['session_date'].dt.strftime('%Y-%m-%d')
+    
+    return sessions[SESSION_COLUMNS]
+
+
+def iter_hit_batches(num_sessions, batch_size=1_000_000, seed=42, end_date=None):
+    """
+    Yield hits for num_sessions sessions, one session batch at a time
+    
+    Session batch i is the same as in iter_gtm_batches; its hits are drawn
+    from child seed (seed, i, 1), so the stream is reproducible and each
+    yielded frame holds roughly 12x batch_size hits.
+    
+    Parameters:
+    num_sessions (int): Total number of sessions to expand
+    batch_size (int): Sessions per batch (default: 1,000,000)
+    seed (int): Master seed (default: 42)
+    end_date (datetime): Last day of the date range (default: now)
+    
+    Yields:
+    pd.DataFrame: Hits of one session batch
+    """
+    
+    batches = iter_gtm_batches(num_sessions, batch_size, seed, end_date)
+    for block_index, batch in enumerate(batches):
+        batch = clean_and_validate_data(batch, verbose=False)
+        yield generate_hit_events(batch, seed=np.random.SeedSequence(seed, spawn_key=(block_index, 1)))
+
+
+def main(num_sessions=750, output_file='gtm_hit_events.parquet', batch_size=1_000_000):
+    """
+    Generate hit-level GTM events and write them batch by batch
+    
+    Parameters:
+    num_sessions (int): Number of sessions to expand (default: 750)
+    output_file (str): CSV or Parquet file to write (default: 'gtm_hit_events.parquet')
+    batch_size (int): Sessions per batch (default: 1,000,000)
+    """
+    
+    print("=" * 60)
+    print("GTM Hit Event Generator")
+    print("=" * 60)
+    
+    print(f"\nExpanding {num_sessions:,} sessions into hits in batches of {batch_size:,}...")
+    start = time.perf_counter()
+    rows = write_batches(output_file, iter_hit_batches(num_sessions, batch_size))
+    elapsed = time.perf_counter() - start
+    
+    print(f"\n✓ {rows:,} hits exported to: {output_file} in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed > 0 else 0:,.0f} hits/sec)")
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="GTM hit-level event generator")
+    parser.add_argument('--sessions', type=int, default=750, help="Number of sessions to expand")
+    parser.add_argument('--output', default='gtm_hit_events.parquet',
+                        help="Output file (.parquet for Parquet, CSV otherwise)")
+    parser.add_argument('--batch-size', type=int, default=1_000_000, help="Sessions per batch")
+    args = parser.parse_args()
+    
+    main(num_sessions=args.sessions, output_file=args.output, batch_size=args.batch_size)